@@ -0,0 +1,233 @@
+import argparse
+import curses
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+# the application reads ~/.config/tertask, keep the benchmark away from the real task list
+os.environ["HOME"] = tempfile.mkdtemp(prefix="tertask-bench-")
+
+import main
+from task import TaskManager
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+class FakeWindow:
+	# enough of curses.window for Application.render without a terminal
+	def __init__(self, height: int=40, width: int=120) -> None:
+		self.height, self.width = height, width
+	def getmaxyx(self) -> tuple[int, int]: return self.height, self.width
+	def addstr(self, *args) -> None: pass
+	def move(self, y: int, x: int) -> None: pass
+	def clrtoeol(self) -> None: pass
+	def noutrefresh(self) -> None: pass
+	def refresh(self) -> None: pass
+	def clear(self) -> None: pass
+	def erase(self) -> None: pass
+	def getch(self, *args) -> int: return -1
+	def keypad(self, flag: bool) -> None: pass
+	def timeout(self, delay: int) -> None: pass
+
+def fake_curses() -> None:
+	curses.color_pair = lambda pair: pair << 8
+	curses.curs_set = lambda visibility: None
+	curses.doupdate = lambda: None
+
+def synthetic_tasks(count: int) -> dict:
+	rng = random.Random(count)
+	words = ["fix", "write", "review", "call", "buy", "plan", "read", "clean", "update", "ship"]
+	return {"next_id": count, "tasks": [{
+		"title": f"{rng.choice(words)} {rng.choice(words)} {i}",
+		"description": f"synthetic task {i}",
+		"checked": rng.random() < 0.3,
+		"created_at": 1704110400000 + i,
+		"updated_at": 1704110400000 + i,
+		"deleted": rng.random() < 0.1,
+		"id": i,
+	} for i in range(count)]}
+
+def make_app(doc: dict) -> main.Application:
+	# start from an empty save file so only doc is loaded
+	path = os.path.join(os.environ["HOME"], ".config/tertask/tasks.json")
+	if os.path.exists(path): os.remove(path)
+	app = main.Application()
+	app.stdscr = FakeWindow()
+	app.tm.load_serialized_tasks(doc)
+	app.tm.max_items = app.height - 9
+	return app
+
+class Bench:
+	# setup(app) returns the operation to time, it is called once per op
+	def __init__(self, name: str, ops: Callable[[int], int], setup: Callable[[main.Application], Callable[[], object]]) -> None:
+		self.name = name
+		self.ops = ops
+		self.setup = setup
+
+def scaled(limit: int) -> Callable[[int], int]:
+	# whole-list operations get fewer repetitions on bigger lists
+	return lambda size: max(3, min(limit, 500_000 // size))
+
+def whole_list(size: int) -> int: return size
+
+def bench_next(app: main.Application) -> Callable[[], object]: return app.tm.next
+def bench_prev(app: main.Application) -> Callable[[], object]: return app.tm.prev
+
+def bench_move_task(app: main.Application) -> Callable[[], object]:
+	tm = app.tm
+	def move() -> None:
+		tm.move_task(tm.selected, (tm.selected + 1) % len(tm))
+	return move
+
+def bench_delete_current_task(app: main.Application) -> Callable[[], object]:
+	return app.tm.delete_current_task
+
+def bench_index_tasks(app: main.Application) -> Callable[[], object]:
+	# _index_tasks() went away when the list started to be indexed on every edit, this indexes the whole list from scratch instead
+	tm = app.tm
+	tasks = tm.all_tasks
+	def index() -> None:
+		tm._rebuild(tasks)
+		tm._filters()
+		tm.current_task
+	return index
+
+def bench_viewport(app: main.Application) -> Callable[[], object]:
+	tm = app.tm
+	def viewport() -> None:
+		tm._view = None
+		tm.current_task
+	return viewport
+
+def bench_serialize_tasks(app: main.Application) -> Callable[[], object]:
+	return app.tm.serialize_tasks
+
+def bench_load_serialized_tasks(app: main.Application) -> Callable[[], object]:
+	doc = app.tm.serialize()
+	tm = TaskManager()
+	return lambda: tm.load_serialized_tasks(doc)
+
+def bench_save(app: main.Application) -> Callable[[], object]:
+	return app.save
+
+def bench_load(app: main.Application) -> Callable[[], object]:
+	app.save()
+	return app.load
+
+def bench_keyevent(app: main.Application) -> Callable[[], object]:
+	keys = list(main.settings.keybindings)
+	return lambda: app.keyevent(random.choice(keys))
+
+def bench_check_keys(app: main.Application) -> Callable[[], object]:
+	keys = [key if isinstance(key, int) else ord(key) for key in main.settings.keybindings]
+	return lambda: app.check_keys(random.choice(keys), blacklist=["quit"])
+
+def bench_render(app: main.Application) -> Callable[[], object]:
+	def render() -> None:
+		app.invalidate()
+		app.render()
+	return render
+
+BENCHES = [
+	Bench("next", whole_list, bench_next),
+	Bench("prev", whole_list, bench_prev),
+	Bench("move_task", lambda size: 1000, bench_move_task),
+	Bench("delete_current_task", lambda size: min(1000, size // 2), bench_delete_current_task),
+	Bench("_index_tasks", scaled(100), bench_index_tasks),
+	Bench("viewport", lambda size: 1000, bench_viewport),
+	Bench("serialize_tasks", scaled(100), bench_serialize_tasks),
+	Bench("load_serialized_tasks", scaled(100), bench_load_serialized_tasks),
+	Bench("save", scaled(20), bench_save),
+	Bench("load", scaled(20), bench_load),
+	Bench("keyevent", lambda size: 100_000, bench_keyevent),
+	Bench("check_keys", lambda size: 100_000, bench_check_keys),
+	Bench("render", lambda size: 200, bench_render),
+]
+
+def percentile(samples: list[int], pct: float) -> float:
+	return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+def run(bench: Bench, doc: dict, size: int, max_ops: int) -> dict:
+	count = max(1, min(bench.ops(size), max_ops))
+	op = bench.setup(make_app(doc))
+	samples = []
+	gc.collect()
+	clock = time.perf_counter_ns
+	start = clock()
+	for _ in range(count):
+		before = clock()
+		op()
+		samples.append(clock() - before)
+	total = clock() - start
+	samples.sort()
+
+	# memory is measured in a second pass, tracing allocations would skew the timings above
+	op = bench.setup(make_app(doc))
+	gc.collect()
+	tracemalloc.start()
+	for _ in range(min(count, 10)): op()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return {
+		"ops": count,
+		"ops_per_sec": round(count / (total / 1e9), 1),
+		"p50_us": round(percentile(samples, 0.50) / 1000, 2),
+		"p99_us": round(percentile(samples, 0.99) / 1000, 2),
+		"peak_kb": round(peak / 1024, 1),
+	}
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+	# a benchmark regresses when its throughput drops by more than tolerance
+	regressions = []
+	for size, benches in results["sizes"].items():
+		for name, result in benches.items():
+			old = baseline.get("sizes", {}).get(size, {}).get(name)
+			if old is None: continue
+			if result["ops_per_sec"] < old["ops_per_sec"] * (1 - tolerance):
+				regressions.append(f"{name} @ {size}: {result['ops_per_sec']} ops/s, baseline {old['ops_per_sec']} ops/s")
+	return regressions
+
+def main_bench() -> int:
+	parser = argparse.ArgumentParser(description="Benchmark the TaskManager and Application hot paths.")
+	parser.add_argument("--sizes", default=",".join(str(size) for size in SIZES), help="comma separated task list sizes")
+	parser.add_argument("--only", default="", help="comma separated benchmark names")
+	parser.add_argument("--max-ops", type=int, default=1_000_000, help="upper bound of timed operations per benchmark")
+	parser.add_argument("--output", default="bench_output.txt", help="where the JSON results are written, - for stdout")
+	parser.add_argument("--baseline", default="bench_baseline.json", help="results to compare against")
+	parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+	parser.add_argument("--tolerance", type=float, default=0.25, help="allowed throughput drop before a regression is reported")
+	args = parser.parse_args()
+
+	fake_curses()
+	sizes = [int(size) for size in args.sizes.split(",")]
+	only = set(filter(None, args.only.split(",")))
+	results: dict = {"python": platform.python_version(), "platform": platform.platform(), "sizes": {}}
+	for size in sizes:
+		doc = synthetic_tasks(size)
+		results["sizes"][str(size)] = {}
+		for bench in BENCHES:
+			if only and bench.name not in only: continue
+			result = run(bench, doc, size, args.max_ops)
+			results["sizes"][str(size)][bench.name] = result
+			print(f"{size:>9} {bench.name:<22} {result['ops_per_sec']:>12.1f} ops/s  p50 {result['p50_us']:>10.2f} us  p99 {result['p99_us']:>10.2f} us  peak {result['peak_kb']:>10.1f} KiB", file=sys.stderr)
+
+	text = json.dumps(results, indent=2)
+	if args.output == "-": print(text)
+	else:
+		with open(args.output, "w") as f: f.write(text)
+	if args.save_baseline:
+		with open(args.baseline, "w") as f: f.write(text)
+		return 0
+	if not os.path.exists(args.baseline): return 0
+	with open(args.baseline) as f: regressions = compare(results, json.load(f), args.tolerance)
+	for regression in regressions: print(f"regression: {regression}", file=sys.stderr)
+	return 1 if regressions else 0
+
+if __name__ == "__main__":
+	sys.exit(main_bench())
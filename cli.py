@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import sys
+from typing import Iterable
+
+from daemon import Client, DaemonError
+from query import QueryError, compile_query
+from storage import Store, export_tasks, open_store, read_document, resolve_mode
+from task import Task, TaskManager, deserialize_task, serialize_task
+from workspace import DEFAULT_LIST, ListIndex, list_path, valid_name
+
+# headless entry point for scripts, shares the save file with main.py but never touches curses
+# when a daemon serves the save file the commands are sent to it instead of loading the file
+
+def read_lines(values: list[str]) -> Iterable[str]:
+	# the arguments, or one value per stdin line when there are none (or just "-")
+	if values and values != ["-"]: return values
+	return (line.rstrip("\n") for line in sys.stdin if line.strip())
+
+def read_ids(values: list[str]) -> tuple[list[int], list[str]]:
+	ids, invalid = [], []
+	for value in read_lines(values):
+		try: ids.append(int(value))
+		except ValueError: invalid.append(value)
+	return ids, invalid
+
+def format_task(task: Task) -> str:
+	line = f"{task.id:>5} {task.mark} {task.title}"
+	return f"{line} — {task.description}" if task.description else line
+
+def print_tasks(tasks: list[Task], args: argparse.Namespace) -> None:
+	if args.json:
+		print(json.dumps([serialize_task(task) for task in tasks]))
+	else:
+		for task in tasks: print(format_task(task))
+
+def read_new_tasks(args: argparse.Namespace) -> Iterable[tuple[str, str]]:
+	# stdin lines may carry a description after a tab
+	for line in read_lines(args.titles if args.titles else ["-"]):
+		title, _, description = line.partition("\t")
+		yield title, description or args.description
+
+def list_flags(args: argparse.Namespace) -> tuple[bool | None, bool | None]:
+	# deleted and checked of the list filter
+	return True if args.deleted else None if args.all else False, True if args.checked else False if args.open else None
+
+def count_key(args: argparse.Namespace) -> str:
+	return "deleted" if args.deleted else "all" if args.all else "checked" if args.checked else "open" if args.open else "active"
+
+def cmd_add(tm: TaskManager, args: argparse.Namespace) -> int:
+	for title, description in read_new_tasks(args):
+		task = tm.add(title, description, args.checked)
+		if args.verbose: print(format_task(task))
+	return 0
+
+def cmd_list(tm: TaskManager, args: argparse.Namespace) -> int:
+	print_tasks(tm.filter(*list_flags(args)), args)
+	return 0
+
+def cmd_count(tm: TaskManager, args: argparse.Namespace) -> int:
+	print(tm.counts()[count_key(args)])
+	return 0
+
+def cmd_search(tm: TaskManager, args: argparse.Namespace) -> int:
+	print_tasks(tm.search(" ".join(args.words)), args)
+	return 0
+
+def cmd_where(tm: TaskManager, args: argparse.Namespace) -> int:
+	# prints the matches, after the action was applied to them
+	print_tasks(compile_query(" ".join(args.query)).run(tm), args)
+	return 0
+
+def cmd_done(tm: TaskManager, args: argparse.Namespace) -> int:
+	ids, invalid = read_ids(args.ids)
+	for task_id in ids:
+		task = tm.get(task_id)
+		if task is None: invalid.append(str(task_id))
+		elif task.checked == args.undo: task.set_checked(not args.undo)
+	return report(invalid)
+
+def cmd_delete(tm: TaskManager, args: argparse.Namespace) -> int:
+	ids, invalid = read_ids(args.ids)
+	for task_id in ids:
+		task = tm.burn(task_id) if args.burn else tm.delete(task_id)
+		if task is None: invalid.append(str(task_id))
+	return report(invalid)
+
+def cmd_export(tm: TaskManager, args: argparse.Namespace) -> int:
+	if args.path == "-": print(json.dumps(tm.serialize()))
+	else: export_tasks(tm, args.path)
+	return 0
+
+def cmd_import(tm: TaskManager, args: argparse.Namespace) -> int:
+	# appends the tasks of an exported file or a bare task list, ids are assigned anew
+	if args.path == "-": data = json.load(sys.stdin)
+	else:
+		data = read_document(args.path)
+	for task in data["tasks"] if isinstance(data, dict) else data:
+		tm.load_serialized_task({**task, "id": tm.next_id})
+	return 0
+
+def remote_add(client: Client, args: argparse.Namespace) -> int:
+	tasks = client.batch([("add", {"title": title, "description": description, "checked": args.checked}) for title, description in read_new_tasks(args)])
+	if args.verbose:
+		for data in tasks: print(format_task(deserialize_task(data)))
+	return 0
+
+def remote_list(client: Client, args: argparse.Namespace) -> int:
+	deleted, checked = list_flags(args)
+	print_tasks([deserialize_task(data) for data in client.call("list", deleted=deleted, checked=checked)], args)
+	return 0
+
+def remote_count(client: Client, args: argparse.Namespace) -> int:
+	print(client.call("count")[count_key(args)])
+	return 0
+
+def remote_search(client: Client, args: argparse.Namespace) -> int:
+	print_tasks([deserialize_task(data) for data in client.call("search", text=" ".join(args.words))], args)
+	return 0
+
+def remote_where(client: Client, args: argparse.Namespace) -> int:
+	print_tasks([deserialize_task(data) for data in client.call("where", query=" ".join(args.query))], args)
+	return 0
+
+def remote_done(client: Client, args: argparse.Namespace) -> int:
+	ids, invalid = read_ids(args.ids)
+	results = client.batch([("toggle", {"id": task_id, "checked": not args.undo}) for task_id in ids])
+	return report(invalid + [str(task_id) for task_id, task in zip(ids, results) if task is None])
+
+def remote_delete(client: Client, args: argparse.Namespace) -> int:
+	ids, invalid = read_ids(args.ids)
+	results = client.batch([("delete", {"id": task_id, "burn": args.burn}) for task_id in ids])
+	return report(invalid + [str(task_id) for task_id, task in zip(ids, results) if task is None])
+
+def report(invalid: list[str]) -> int:
+	for value in invalid: print(f"Task not found: {value}", file=sys.stderr)
+	return 1 if invalid else 0
+
+COMMANDS = {
+	"add": cmd_add,
+	"list": cmd_list,
+	"count": cmd_count,
+	"search": cmd_search,
+	"where": cmd_where,
+	"done": cmd_done,
+	"delete": cmd_delete,
+	"export": cmd_export,
+	"import": cmd_import,
+}
+
+# commands a running daemon answers, export and import work on files and run here
+REMOTE = {
+	"add": remote_add,
+	"list": remote_list,
+	"count": remote_count,
+	"search": remote_search,
+	"where": remote_where,
+	"done": remote_done,
+	"delete": remote_delete,
+}
+
+def parser() -> argparse.ArgumentParser:
+	parser = argparse.ArgumentParser(prog="tertask", description="Edit the tertask list without the terminal UI.")
+	parser.add_argument("--list", default=DEFAULT_LIST, help="task list in ~/.config/tertask, see :list")
+	parser.add_argument("--file", help="save file, instead of the one of --list")
+	parser.add_argument("--mode", choices=["file", "journal", "sqlite", "binary"], help="save_mode of the save file, found from the files next to it by default")
+	parser.add_argument("--no-daemon", action="store_true", help="load the save file even when a daemon serves it")
+	commands = parser.add_subparsers(dest="command", required=True)
+
+	add = commands.add_parser("add", help="add tasks, one per stdin line without titles")
+	add.add_argument("titles", nargs="*")
+	add.add_argument("-d", "--description", default="")
+	add.add_argument("-c", "--checked", action="store_true")
+	add.add_argument("-v", "--verbose", action="store_true", help="print the added tasks")
+
+	list_ = commands.add_parser("list", help="print tasks")
+	list_.add_argument("--all", action="store_true", help="include deleted tasks")
+	list_.add_argument("--deleted", action="store_true", help="only deleted tasks")
+	list_.add_argument("--checked", action="store_true", help="only checked tasks")
+	list_.add_argument("--open", action="store_true", help="only open tasks")
+	list_.add_argument("--json", action="store_true")
+
+	count = commands.add_parser("count", help="print the number of tasks, for status bars and prompts")
+	count.add_argument("--all", action="store_true", help="include deleted tasks")
+	count.add_argument("--deleted", action="store_true", help="only deleted tasks")
+	count.add_argument("--checked", action="store_true", help="only checked tasks")
+	count.add_argument("--open", action="store_true", help="only open tasks")
+
+	search = commands.add_parser("search", help="print the tasks containing all of the words")
+	search.add_argument("words", nargs="+")
+	search.add_argument("--json", action="store_true")
+
+	where = commands.add_parser("where", help="print the tasks matching a query, '| delete' and the like apply an action to them")
+	where.add_argument("query", nargs="+")
+	where.add_argument("--json", action="store_true")
+
+	done = commands.add_parser("done", help="check tasks by id, read from stdin without ids")
+	done.add_argument("ids", nargs="*")
+	done.add_argument("--undo", action="store_true", help="uncheck instead")
+
+	delete = commands.add_parser("delete", help="move tasks to the trash by id, read from stdin without ids")
+	delete.add_argument("ids", nargs="*")
+	delete.add_argument("--burn", action="store_true", help="delete forever")
+
+	export = commands.add_parser("export", help="write all tasks as json, or in the binary format for a .bin file")
+	export.add_argument("path", nargs="?", default="-")
+
+	import_ = commands.add_parser("import", help="append the tasks of an exported json or .bin file")
+	import_.add_argument("path", nargs="?", default="-")
+	return parser
+
+def run(argv: list[str] | None=None) -> int:
+	options = parser()
+	args = options.parse_args(argv)
+	if not valid_name(args.list): options.error(f"'{args.list}' is not a list name, use letters, digits, _ and -")
+	folder = os.path.join(os.path.expanduser("~"), ".config/tertask")
+	if args.file is None: args.file = list_path(folder, args.list)
+	try: args.mode = resolve_mode(args.file, args.mode)
+	except ValueError as e: options.error(str(e))
+	client = None if args.no_daemon else Client.connect(args.file)
+	if client is not None:
+		if args.command in REMOTE: return REMOTE[args.command](client, args)
+		# the file is about to be read, the daemon writes out what it holds first
+		client.call("save")
+	os.makedirs(os.path.dirname(os.path.abspath(args.file)), exist_ok=True)
+	tm = TaskManager()
+	store: Store = open_store(args.file, args.mode)
+	store.load(tm)
+	tm.mark_saved()
+	with tm.batch():
+		status = COMMANDS[args.command](tm, args)
+	# everything above only changed memory, the save file is written once
+	if tm.has_unsaved_changes:
+		# another instance may have saved since the load, its changes are merged first
+		for task in store.save_merged(tm): print(f"Conflict: task {task.id} '{task.title}' was changed by another instance too, kept the newer edit", file=sys.stderr)
+		if client is not None: client.call("sync")
+		if args.file == list_path(folder, args.list): ListIndex(folder).update(args.list, tm)
+	return status
+
+if __name__ == "__main__":
+	try:
+		sys.exit(run())
+	except DaemonError as e:
+		print(f"Daemon error: {e}", file=sys.stderr)
+		sys.exit(1)
+	except QueryError as e:
+		print(f"Invalid query: {e}", file=sys.stderr)
+		sys.exit(2)
+	except BrokenPipeError:
+		# output piped into head and the like, the save file was already written
+		sys.stderr.close()
+		sys.exit(1)
@@ -0,0 +1,265 @@
+import argparse
+import json
+import os
+import selectors
+import signal
+import socket
+import sys
+
+from query import compile_query
+from storage import Autosaver, Store, open_store, resolve_mode
+from task import TaskManager, serialize_task
+
+# keeps one TaskManager in memory and serves it over a unix socket next to the save file
+# the protocol is JSON-RPC 2.0, one request (or batch) per line and one response line back
+
+PARSE_ERROR, INVALID_REQUEST, METHOD_NOT_FOUND, INVALID_PARAMS, INTERNAL_ERROR = -32700, -32600, -32601, -32602, -32603
+
+class DaemonError(Exception):
+	def __init__(self, code: int, message: str) -> None:
+		super().__init__(message)
+		self.code = code
+
+def socket_path(save_path: str) -> str:
+	return os.path.splitext(save_path)[0] + ".sock"
+
+class Client:
+	# a connection to a running daemon, calls are answered in order
+	def __init__(self, sock: socket.socket) -> None:
+		self.sock = sock
+		self.reader = sock.makefile("rb")
+		self.last_id = 0
+
+	@classmethod
+	def connect(cls, save_path: str, timeout: float=5.0) -> "Client | None":
+		# None when no daemon serves the save file, a socket left behind by a killed daemon included
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		sock.settimeout(timeout)
+		try:
+			sock.connect(socket_path(save_path))
+		except (FileNotFoundError, ConnectionRefusedError):
+			sock.close()
+			return None
+		return cls(sock)
+
+	def call(self, method: str, **params):
+		return self.batch([(method, params)])[0]
+
+	def batch(self, calls: list[tuple[str, dict]]) -> list:
+		# all calls in one round trip, the daemon applies them one after another
+		if not calls: return []
+		requests = []
+		for method, params in calls:
+			self.last_id += 1
+			requests.append({"jsonrpc": "2.0", "id": self.last_id, "method": method, "params": params})
+		self.sock.sendall(json.dumps(requests if len(requests) > 1 else requests[0]).encode() + b"\n")
+		line = self.reader.readline()
+		if not line: raise DaemonError(INTERNAL_ERROR, "the daemon closed the connection")
+		responses = json.loads(line)
+		if isinstance(responses, dict): responses = [responses]
+		results = {}
+		for response in responses:
+			if "error" in response: raise DaemonError(response["error"]["code"], response["error"]["message"])
+			results[response["id"]] = response["result"]
+		return [results[request["id"]] for request in requests]
+
+	def close(self) -> None:
+		self.reader.close()
+		self.sock.close()
+
+class Daemon:
+	# requests are handled one at a time on a single thread, every client sees each change as soon as it was answered
+	def __init__(self, save_path: str, store: Store, delay: float=0.5) -> None:
+		self.path = socket_path(save_path)
+		self.store = store
+		self.tm = TaskManager()
+		store.load(self.tm)
+		self.tm.mark_saved()
+		self.autosaver = Autosaver(store, delay)
+		self.selector = selectors.DefaultSelector()
+		self.inbox: dict[socket.socket, bytearray] = {}
+		self.outbox: dict[socket.socket, bytearray] = {}
+		self.running = False
+
+	def serve(self) -> None:
+		# a socket nobody answers on was left behind by a daemon that was killed
+		if os.path.exists(self.path): os.remove(self.path)
+		listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		listener.bind(self.path)
+		listener.listen()
+		listener.setblocking(False)
+		self.selector.register(listener, selectors.EVENT_READ)
+		self.running = True
+		try:
+			while self.running:
+				for key, events in self.selector.select(0.2):
+					if key.fileobj is listener: self._accept(listener)
+					else: self._io(key.fileobj, events)
+				# edits of instances that write the save file themselves, and the debounced save of our own
+				self.sync()
+				self.autosaver.tick(self.tm)
+		finally:
+			self.selector.close()
+			listener.close()
+			os.remove(self.path)
+			self.save()
+
+	def stop(self, *args) -> None:
+		self.running = False
+
+	def sync(self) -> None:
+		if not self.store.changed(): return
+		self.autosaver.settle(self.tm)
+		if self.store.changed(): self.store.merge(self.tm)
+
+	def save(self) -> None:
+		self.autosaver.settle(self.tm)
+		if self.tm.has_unsaved_changes:
+			self.store.save_merged(self.tm)
+			self.tm.mark_saved()
+
+	def _accept(self, listener: socket.socket) -> None:
+		conn, _ = listener.accept()
+		conn.setblocking(False)
+		self.inbox[conn], self.outbox[conn] = bytearray(), bytearray()
+		self.selector.register(conn, selectors.EVENT_READ)
+
+	def _io(self, conn: socket.socket, events: int) -> None:
+		if events & selectors.EVENT_READ:
+			try:
+				data = conn.recv(65536)
+			except ConnectionError:
+				data = b""
+			if not data:
+				self._close(conn)
+				return
+			inbox = self.inbox[conn]
+			inbox += data
+			while (end := inbox.find(b"\n")) >= 0:
+				reply = self.handle(bytes(inbox[:end]))
+				del inbox[:end + 1]
+				if reply is not None: self.outbox[conn] += reply + b"\n"
+		self._flush(conn)
+
+	def _flush(self, conn: socket.socket) -> None:
+		# a slow reader gets the rest of a big answer when its socket is writable again
+		outbox = self.outbox[conn]
+		try:
+			if outbox: del outbox[:conn.send(outbox)]
+		except BlockingIOError:
+			pass
+		except ConnectionError:
+			self._close(conn)
+			return
+		self.selector.modify(conn, selectors.EVENT_READ | selectors.EVENT_WRITE if outbox else selectors.EVENT_READ)
+
+	def _close(self, conn: socket.socket) -> None:
+		self.selector.unregister(conn)
+		del self.inbox[conn], self.outbox[conn]
+		conn.close()
+
+	def handle(self, line: bytes) -> bytes | None:
+		# None for notifications, which get no response
+		if not line.strip(): return None
+		try:
+			request = json.loads(line)
+		except ValueError:
+			return json.dumps(error(None, PARSE_ERROR, "parse error")).encode()
+		if isinstance(request, list):
+			if not request: return json.dumps(error(None, INVALID_REQUEST, "empty batch")).encode()
+			responses = [response for response in map(self.call, request) if response is not None]
+			return json.dumps(responses).encode() if responses else None
+		response = self.call(request)
+		return None if response is None else json.dumps(response).encode()
+
+	def call(self, request) -> dict | None:
+		if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+			return error(None, INVALID_REQUEST, "invalid request")
+		request_id = request.get("id")
+		method = getattr(self, f"rpc_{request['method']}", None)
+		params = request.get("params", {})
+		if method is None: response = error(request_id, METHOD_NOT_FOUND, f"unknown method '{request['method']}'")
+		elif not isinstance(params, dict): response = error(request_id, INVALID_PARAMS, "params have to be an object")
+		else:
+			# files written by other instances are merged first, so reads are never older than the disk
+			self.sync()
+			try:
+				with self.tm.batch():
+					response = {"jsonrpc": "2.0", "id": request_id, "result": method(**params)}
+			except (TypeError, ValueError) as e:
+				response = error(request_id, INVALID_PARAMS, str(e))
+			except Exception as e:
+				response = error(request_id, INTERNAL_ERROR, f"{type(e).__name__}: {e}")
+			self.autosaver.tick(self.tm)
+		return response if "id" in request else None
+
+	def rpc_list(self, deleted: bool | None=False, checked: bool | None=None, offset: int=0, limit: int | None=None) -> list[dict]:
+		return [serialize_task(task) for task in self.tm.filter(deleted, checked, offset, limit)]
+
+	def rpc_count(self) -> dict[str, int]:
+		return self.tm.counts()
+
+	def rpc_search(self, text: str, limit: int | None=None) -> list[dict]:
+		return [serialize_task(task) for task in self.tm.search(text)[:limit]]
+
+	def rpc_where(self, query: str) -> list[dict]:
+		# the matches, after the action of the query was applied to them
+		return [serialize_task(task) for task in compile_query(query).run(self.tm)]
+
+	def rpc_add(self, title: str, description: str="", checked: bool=False) -> dict:
+		return serialize_task(self.tm.add(str(title), str(description), bool(checked)))
+
+	def rpc_toggle(self, id: int, checked: bool | None=None) -> dict | None:
+		# flips the task, or sets it when checked is given, None when there is no such task
+		task = self.tm.get(id)
+		if task is None: return None
+		if checked is None or task.checked != checked: task.toggle()
+		return serialize_task(task)
+
+	def rpc_delete(self, id: int, burn: bool=False) -> dict | None:
+		task = self.tm.burn(id) if burn else self.tm.delete(id)
+		return None if task is None else serialize_task(task)
+
+	def rpc_save(self) -> None:
+		# writes everything now, for clients that are about to read or write the save file themselves
+		self.save()
+
+	def rpc_sync(self) -> None:
+		self.sync()
+
+	def rpc_stop(self) -> None:
+		self.running = False
+
+def error(request_id, code: int, message: str) -> dict:
+	return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+def run(argv: list[str] | None=None) -> int:
+	parser = argparse.ArgumentParser(prog="tertask-daemon", description="Serve the tertask list to clients over a unix socket.")
+	parser.add_argument("--file", default=os.path.join(os.path.expanduser("~"), ".config/tertask/tasks.json"), help="save file")
+	parser.add_argument("--mode", choices=["file", "journal", "sqlite", "binary"], help="save_mode of the save file, found from the files next to it by default")
+	parser.add_argument("--delay", type=float, default=0.5, help="seconds after the last edit before it is saved")
+	parser.add_argument("--stop", action="store_true", help="stop the running daemon")
+	args = parser.parse_args(argv)
+	if args.stop:
+		client = Client.connect(args.file)
+		if client is None:
+			print("No daemon is running", file=sys.stderr)
+			return 1
+		client.call("stop")
+		return 0
+	try: args.mode = resolve_mode(args.file, args.mode)
+	except ValueError as e: parser.error(str(e))
+	client = Client.connect(args.file)
+	if client is not None:
+		client.close()
+		print(f"A daemon is already serving {args.file}", file=sys.stderr)
+		return 1
+	os.makedirs(os.path.dirname(os.path.abspath(args.file)), exist_ok=True)
+	daemon = Daemon(args.file, open_store(args.file, args.mode), args.delay)
+	signal.signal(signal.SIGTERM, daemon.stop)
+	signal.signal(signal.SIGINT, daemon.stop)
+	daemon.serve()
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(run())
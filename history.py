@@ -0,0 +1,109 @@
+from collections import deque
+
+from task import Task, TaskManager
+
+# events undone by writing the old value back, they never change a position
+FIELDS = ("title", "description", "checked", "updated_at")
+
+class History:
+	# undo and redo as inverse operations, one step per key press or batch and at most limit steps
+	# an operation is [event, task, old, new], or [add|burn, task, position, layout, rank] for tasks that come and go
+	# tasks are kept as objects, they keep their identity through reorders and a change of id
+	def __init__(self, tm: TaskManager, limit: int=100) -> None:
+		self.tm = tm
+		self.undo_steps: deque[list[list]] = deque(maxlen=limit)
+		self.redo_steps: list[list[list]] = []
+		self.step: list[list] = []
+		# operations of the open step that later events of the same kind are folded into
+		self._fields: dict[tuple[str, Task], list] = {}
+		self._move: list | None = None
+		self.replaying = False
+		tm.history = self
+
+	@property
+	def can_undo(self) -> bool: return bool(self.step or self.undo_steps)
+	@property
+	def can_redo(self) -> bool: return bool(self.redo_steps) and not self.step
+
+	def record(self, event: str, task: Task | None, old) -> None:
+		if self.replaying: return
+		if task is None:
+			# the whole order was replaced, nothing short of a snapshot could undo that
+			self.clear()
+			return
+		if event in FIELDS:
+			op = self._fields.get((event, task))
+			if op is not None:
+				op[3] = getattr(task, f"_{event}")
+				return
+			op = self._fields[(event, task)] = [event, task, old, getattr(task, f"_{event}")]
+		elif event == "move":
+			# a burst of moves of the same task is a single move from the first to the last position
+			if self._move is not None and self._move[1] is task:
+				self._move[3] = self.tm.position(task)
+				return
+			op = self._move = [event, task, old, self.tm.position(task)]
+		else:
+			# adds, burns and deletes shift positions, later moves are recorded on their own
+			self._move = None
+			if event == "deleted": op = [event, task, old, task.deleted]
+			elif event in ("add", "burn"): op = [event, task, self.tm.position(task), self.tm.layout, self.tm.rank(task)]
+			else: return
+		self.step.append(op)
+
+	def checkpoint(self) -> None:
+		# closes the open step, a new edit drops everything that could be redone
+		if not self.step: return
+		self.undo_steps.append(self.step)
+		self.redo_steps.clear()
+		self.step, self._fields, self._move = [], {}, None
+
+	def discard(self) -> None:
+		# forgets the open step, its events were rolled back
+		self.step, self._fields, self._move = [], {}, None
+
+	def clear(self) -> None:
+		self.discard()
+		self.undo_steps.clear()
+		self.redo_steps.clear()
+
+	def undo(self) -> Task | None:
+		# returns the task the undone step touched first, None when there was nothing to undo
+		self.checkpoint()
+		if not self.undo_steps: return None
+		step = self.undo_steps.pop()
+		task = self._apply(reversed(step), True)
+		self.redo_steps.append(step)
+		return task
+
+	def redo(self) -> Task | None:
+		if self.step or not self.redo_steps: return None
+		step = self.redo_steps.pop()
+		task = self._apply(step, False)
+		self.undo_steps.append(step)
+		return task
+
+	def _apply(self, ops, undo: bool) -> Task | None:
+		# every operation emits its event, so stores and views follow like for any other edit
+		tm, task = self.tm, None
+		self.replaying = True
+		try:
+			for op in ops:
+				event, task = op[0], op[1]
+				if event in ("add", "burn"):
+					if (event == "add") == undo:
+						if task._manager is tm: tm._burn(task)
+						op[3] = tm.layout
+					elif task._manager is None: tm._revive(task, op[2], op[3], op[4])
+					continue
+				if task._manager is not tm: continue
+				value = op[2] if undo else op[3]
+				if event == "move":
+					if not task.deleted and 0 <= value < tm.active_count: tm._move(tm.position(task), value)
+					continue
+				current = getattr(task, f"_{event}")
+				setattr(task, f"_{event}", value)
+				tm._changed(task, event, current)
+		finally:
+			self.replaying = False
+		return task
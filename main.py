@@ -1,10 +1,18 @@
 import curses
 import os
-import json
 import sys
+import time
 from re import T
 from typing import cast
-from task import Task, TaskManager, serialize_task
+from task import Task, TaskManager
+from views import VIEWS
+from storage import Autosaver, export_tasks, open_store
+from stats import Stats
+from history import History
+from daemon import Client, DaemonError
+from timers import Timers
+from query import ACTIONS as QUERY_ACTIONS, QueryError, compile_query
+from workspace import DEFAULT_LIST, ListCache, ListIndex, list_path, valid_name
 from envutils import ADict
 
 EVENTS = [
@@ -23,8 +31,19 @@ EVENTS = [
 	"special:arrow pressed",
 	"command",
 	"trash menu",
+	"undo",
+	"redo",
+	"recover task",
 ]
 
+# what the application keeps per task list, swapped out as a whole when another list is shown
+PER_LIST = ("list_name", "save_path", "tm", "store", "history", "autosaver", "daemon", "search_results", "search_at")
+
+# events that only move the selection, repeats of them queued by a held key are handled as one jump
+NAVIGATION = {"next task", "prev task", "special:arrow pressed"}
+# what keys can do while the trash is shown, delete burns the selected task there
+TRASH_ACTIONS = ["next task", "prev task", "special:arrow pressed", "recover task", "delete task", "force delete task", "trash menu", "quit", "force quit", "save tasks", "command", "help menu", "undo", "redo"]
+
 settings = ADict(
 	keybindings={
 		"q": ["quit"],
@@ -37,6 +56,9 @@ settings = ADict(
 		"D": ["force delete task"],
 		"s": ["save tasks"],
 		"t": ["trash menu"],
+		"u": ["undo"],
+		"U": ["redo"],
+		"R": ["recover task"],
 
 		":": ["command"],
 		"e": ["command"],
@@ -56,6 +78,19 @@ settings = ADict(
 	prompt_unsaved=True,
 	prompt_delete=True,
 	show_index=True,
+	save_mode="file", # ["file", "journal", "sqlite", "binary"]
+	journal_compact_after=1000,
+	autosave=False,
+	lazy_load=False,
+	columnar=False,
+	autosave_delay=2.0,
+	stats=False,
+	stats_file="", # written on exit when stats are on
+	undo_limit=100, # undo steps kept in memory
+	watch=True, # merge what other instances save into the open list
+	daemon=True, # coordinate saves with a daemon serving the same save file
+	list=DEFAULT_LIST, # task list shown on startup, a file of its own in ~/.config/tertask
+	lists_in_memory=2, # the shown list and the ones shown most recently before it
 	info=ADict(
 		description=True,
 		created_at=True,
@@ -63,45 +98,234 @@ settings = ADict(
 	)
 )
 
+def compile_keybindings(keybindings: dict[str | int, list[str]]) -> tuple[dict[int, list[str]], dict[int, list[str]]]:
+	# key code -> bound actions (first binding wins, like the old scan) and key code -> events in EVENTS order
+	bindings: dict[int, list[str]] = {}
+	for skey, actions in keybindings.items():
+		bindings.setdefault(skey if isinstance(skey, int) else ord(skey), actions)
+	dispatch = {code: [event for event in EVENTS if event in actions] for code, actions in bindings.items()}
+	return bindings, dispatch
+
 class Application:
 	def __init__(self) -> None:
 		self.rename_mode = False
 		self.move_mode   = False
 		self.command_mode = False
 		self.trash_mode = False
-
-		self.save_path = os.path.join(os.path.expanduser("~"),".config/tertask/tasks.json")
+		self.search_results: list[int] = []
+		self.search_at = -1
+		self.stats = Stats() if settings.stats else None
+
+		self.folder = os.path.join(os.path.expanduser("~"), ".config/tertask")
+		self.list_name = settings.list if valid_name(settings.list) else DEFAULT_LIST
+		self.save_path = list_path(self.folder, self.list_name)
+		self.lists = ListCache(max(0, settings.lists_in_memory - 1))
+		self.index = ListIndex(self.folder)
+		self.daemon: Client | None = None
 		self.load()
 		self.custom_message = ""
 		self.custom_type = "info"
+		self.frame: dict[int, list[tuple[int, str, int]]] = {}
+		self.rows: dict[int, list[tuple[int, str, int]]] = {}
+		self.screen_size = (0, 0)
+		self.coalesced = 0
+		self.compile_keys()
+		self.timers = Timers()
+		if settings.watch: self.timers.every(0.2, self.sync)
+		if self.autosaver is not None: self.timers.every(0.2, self.autosave)
 
 	def load(self) -> None:
-		save_exists = os.path.exists(self.save_path)
-
 		self.create_folder_if_missing(os.path.dirname(self.save_path))
 
 		self.tm = TaskManager()
-		if save_exists:
-			data = self.open_json(self.save_path)
-			self.tm.load_serialized_tasks(data)
+		self.notify_daemon("save")
+		self.store = open_store(self.save_path, settings.save_mode, settings.journal_compact_after, settings.lazy_load, settings.columnar)
+		self.store.load(self.tm)
+		self.tm.mark_saved()
+		self.history = History(self.tm, settings.undo_limit)
+		self.autosaver = Autosaver(self.store, settings.autosave_delay) if settings.autosave else None
+		self.index.update(self.list_name, self.tm)
 
 	def save(self) -> None:
-		with open(self.save_path, "w") as f:
-			f.truncate(0)
-			f.write(json.dumps([serialize_task(task) for task in self.tm._tasks]))
+		start = time.perf_counter_ns()
+		if self.autosaver is not None: self.autosaver.settle(self.tm)
+		conflicts = self.store.save_merged(self.tm)
+		self.tm.mark_saved()
+		self.notify_daemon("sync")
+		self.index.update(self.list_name, self.tm)
+		if conflicts: self.report_merge(conflicts)
+		if self.stats is not None: self.stats.record("save", time.perf_counter_ns() - start)
+
+	def sync(self) -> bool:
+		# merges what other instances saved since the last load, save or merge, True when something was merged
+		if not self.store.changed(): return False
+		if self.autosaver is not None: self.autosaver.settle(self.tm)
+		# the change may have been our own queued write
+		if not self.store.changed(): return False
+		self.report_merge(self.store.merge(self.tm))
+		return True
+
+	def notify_daemon(self, method: str) -> None:
+		# a running daemon writes out its edits before we read the file, and merges our saves right away instead of on its next poll
+		if not settings.daemon: return
+		try:
+			if self.daemon is None: self.daemon = Client.connect(self.save_path, timeout=1.0)
+			if self.daemon is not None: self.daemon.call(method)
+		except (OSError, DaemonError):
+			# it went away, the save file is all the instances share
+			self.daemon = None
+
+	def switch_list(self, name: str) -> None:
+		# the list that is left is saved and stays loaded until lists_in_memory newer ones pushed it out
+		if name == self.list_name: return
+		if self.tm.has_unsaved_changes: self.save()
+		state = self.lists.take(name)
+		for evicted in self.lists.stash(self.list_name, {attr: getattr(self, attr) for attr in PER_LIST}): self.close_list(evicted)
+		if state is not None:
+			for attr, value in state.items(): setattr(self, attr, value)
+			self.sync()
+		else:
+			# only now parsed, lists that are not shown cost neither startup time nor memory
+			self.list_name, self.save_path, self.daemon = name, list_path(self.folder, name), None
+			self.search_results, self.search_at = [], -1
+			self.load()
+		self.trash_mode = False
+		self.custom_type = "info"
+		self.custom_message = f"Showing list '{name}' ({self.tm.active_count} task{'s' if self.tm.active_count != 1 else ''})"
+
+	def close_list(self, state: dict) -> None:
+		# an evicted list is dropped from memory, its edits were saved when it was left
+		if state["autosaver"] is not None:
+			state["autosaver"].settle(state["tm"])
+			state["autosaver"].close()
+		if state["tm"].has_unsaved_changes: state["store"].save_merged(state["tm"])
+		state["store"].close()
+		if state["daemon"] is not None: state["daemon"].close()
+
+	def show_lists(self) -> None:
+		# from the index, none of the lists is opened for it
+		counts = self.index.read()
+		names = []
+		for name in self.index.names():
+			entry = counts.get(name)
+			label = f"{name} ({entry['active']})" if entry is not None else name
+			names.append(f"[{label}]" if name == self.list_name else label)
+		self.custom_type = "info"
+		self.custom_message = "Lists: " + " ".join(names)
+
+	def report_merge(self, conflicts: list[Task]) -> None:
+		if not conflicts:
+			self.custom_type = "info"
+			self.custom_message = "Merged changes from another instance"
+			return
+		more = f" and {len(conflicts) - 1} more" if len(conflicts) > 1 else ""
+		self.custom_type = "warning"
+		self.custom_message = f"'{conflicts[0].title}'{more} changed in another instance too, kept the newer edit"
+
+	def autosave(self) -> bool:
+		# True when the message bar changed
+		if self.autosaver is None: return False
+		# never queue a write over changes that were not merged yet
+		merged = self.sync()
+		unsaved = self.tm.has_unsaved_changes
+		self.autosaver.tick(self.tm)
+		# the write was queued, saves never go through save() with autosave on
+		if unsaved and not self.tm.has_unsaved_changes: self.index.update(self.list_name, self.tm)
+		if self.autosaver.error is None: return merged
+		self.custom_type = "error"
+		self.custom_message = f"Autosave failed: {self.autosaver.error}"
+		return True
+
+	def show_task(self, task: Task) -> None:
+		# selects the task, going back to the list view when the current view does not show it
+		if not self.tm.reveal(task):
+			self.tm.set_view("list")
+			self.tm.reveal(task)
+
+	def start_move(self) -> None:
+		if self.tm.view_name == "list":
+			self.move_mode = True
+		else:
+			self.custom_type = "warning"
+			self.custom_message = "Tasks can only be moved in the list view"
+
+	def undo(self, redo: bool=False) -> None:
+		steps = self.history.redo_steps if redo else self.history.undo_steps
+		self.history.checkpoint()
+		if not steps:
+			self.custom_type = "warning"
+			self.custom_message = f"Nothing to {'redo' if redo else 'undo'}"
+			return
+		# one toggle records both checked and updated_at, the message counts tasks
+		count = len({op[1] for op in steps[-1]})
+		task = self.history.redo() if redo else self.history.undo()
+		if task is not None and self.tm.get(task.id) is task and not task.deleted: self.show_task(task)
+		self.custom_type = "info"
+		self.custom_message = f"{'Redid' if redo else 'Undid'} changes to {count} task{'s' if count != 1 else ''}"
+
+	def recover_selected(self) -> None:
+		task = self.tm.trash_task
+		if task is None: return
+		task.restore()
+		self.custom_type = "info"
+		self.custom_message = f"Recovered '{task.title}'"
+
+	def burn_selected(self) -> None:
+		task = self.tm.trash_task
+		if task is None: return
+		self.tm.burn(task.id)
+		self.custom_type = "info"
+		self.custom_message = f"Deleted '{task.title}' forever"
+
+	def next_search_result(self) -> None:
+		# cycles through the last search, results that were deleted or burned since are skipped
+		for _ in range(len(self.search_results)):
+			self.search_at = (self.search_at + 1) % len(self.search_results)
+			task = self.tm.get(self.search_results[self.search_at])
+			if task is None or task.deleted or not self.tm.reveal(task): continue
+			self.custom_type = "info"
+			self.custom_message = f"Match {self.search_at + 1}/{len(self.search_results)}: '{task.title}'"
+			return
+		self.custom_type = "warning"
+		self.custom_message = "No matches"
+
+	def quit(self) -> None:
+		# queued autosaves are written before the process goes away
+		if self.autosaver is not None: self.autosaver.flush()
+		if not self.tm.has_unsaved_changes: self.index.update(self.list_name, self.tm)
+		exit(0)
+
+	def collect_stats(self) -> Stats:
+		self.stats.counters["viewport builds"] = self.tm.viewport_builds
+		self.stats.counters["coalesced keys"] = self.coalesced
+		if self.autosaver is not None:
+			self.stats.counters["autosave writes"] = self.autosaver.writes
+			self.stats.counters["autosave queue"] = self.autosaver.queue_depth
+		return self.stats
+
+	def dump_stats(self, path: str) -> None:
+		self.collect_stats().dump(path)
+
+	def show_stats(self) -> None:
+		self.invalidate()
+		self.stdscr.addstr(1, 2, " Stats - Press any key to return ", curses.A_BOLD | curses.A_REVERSE)
+		for idx, line in enumerate(self.collect_stats().lines()[:self.height - 4], start=3):
+			self.stdscr.addstr(idx, 2, line[:self.width - 3])
+		self.stdscr.getch()
+		self.invalidate()
+
+	def compile_keys(self) -> None:
+		self.bindings, self.dispatch = compile_keybindings(settings.keybindings)
+
+	def bind(self, key: str | int, actions: list[str]) -> None:
+		settings.keybindings[key] = actions
+		self.compile_keys()
 
 	def keyevent(self, key: str | int) -> list[str]:
-		for skey in settings.keybindings:
-			actions_to_return = []
-			for actions in settings.keybindings[skey]:
-				is_int = isinstance(skey, int)
-				if is_int and key == skey: actions_to_return.append(actions)
-				if not is_int and key == ord(skey): actions_to_return.append(actions)
-			if actions_to_return: return actions_to_return
-		return [""]
+		return self.bindings.get(key if isinstance(key, int) else ord(key)) or [""]
 
 	def show_help(self, page: int=1) -> None:
-		self.stdscr.clear()
+		self.invalidate()
 		self.stdscr.addstr(1, 2, " Help Menu - Press 'q' to return ", curses.A_BOLD | curses.A_REVERSE)
 		self.stdscr.addstr(2, 2, " (c)ommands, (k)eybindings ", curses.A_BOLD)
 		mode = "Help"
@@ -116,7 +340,7 @@ class Application:
 				" q!                         — quit without saving",
 				" w                          — save tasks",
 				" wq                         — save tasks and quit",
-				" export <file>                — export tasks to file",
+				" export <file>              — export tasks to file, binary for .bin",
 				" rename | rn <name...>      — rename task",
 				" delete | del | d <task id> — delete task",
 				" describe | desc <desc...>  — set task description",
@@ -124,8 +348,15 @@ class Application:
 				" move mode | mm             — move task",
 				" a | add                    — add task",
 				" h | help                   — show this help menu",
-				" recover | rev <task id>    — recover a deleted task",
+				" recover | rev <task id>    — recover a deleted task, R on the selected one in the trash",
 				" burn <task id>             — delete a task forever",
+				" undo | u / redo            — undo or redo the last change",
+				" autosave                   — show autosave stats",
+				" stats [on|off|dump <file>] — show key latency stats",
+				" search | / [terms...]      — find tasks, again to cycle",
+				" where <query> [| action]   — find tasks by query or delete, recover, burn, check, uncheck or toggle them",
+				" list | ls [name]           — switch to or create a task list, without a name show all lists",
+				" view | v <name>            — list, open, checked, created, updated or title order",
 			]
 			self.stdscr.addstr(4, 2, " Commands: ", curses.A_BOLD)
 			self.stdscr.addstr(5, 4, "\n    ".join(text))
@@ -152,22 +383,11 @@ class Application:
 			self.show_help()
 
 	def render(self, only_render: bool=False) -> None:
-		self.stdscr.clear()
+		self.frame = {}
 
 		# Trash menu
 		if self.trash_mode:
-			self.stdscr.addstr(1, 2, " Trash Menu - Press 't' to return ", curses.A_BOLD | curses.A_REVERSE)
-			if not self.tm.deleted_tasks:
-				self.stdscr.addstr(2, 2, "No deleted tasks available.")
-			else:
-				self.stdscr.addstr(2, 2, "use :recover <task id> to recover a task or :burn <task id> to delete a task forever")
-				for idx, task in enumerate(self.tm.deleted_tasks):
-					task = cast(Task, task) # convert to Task object
-					x = 2
-					y = 3 + idx
-					is_completed_attr = curses.color_pair(2) if task.completed else curses.A_NORMAL
-					self.draw_task(x, y, task, attr=is_completed_attr)
-					self.add_string(f"{task.index} {task.mark} {task.title} — {task.description:20}", x, y, curses.color_pair(3))
+			self.render_trash()
 			return
 
 		# Task list
@@ -193,7 +413,7 @@ class Application:
 					if new_name: task.title = new_name
 					self.rename_mode = False
 					self.render()
-					break
+					return
 				elif self.move_mode and not only_render:
 					self.render(only_render=True)
 					self.add_string(f" ↕ {task.mark} {task.title}", x, y, curses.color_pair(1))
@@ -204,32 +424,28 @@ class Application:
 						self.tm.move_task(self.tm.selected, self.tm.selected + move_dir)
 					self.move_mode = "move task" not in actions
 					self.render()
-					break
+					return
 				else:
 					self.draw_task(x, y, task, selected=True)
 					if not settings.use_colors:
 						self.draw_task(x, y, task, selected=True, attr=curses.A_REVERSE)
 					string = f"{task.mark} {task.title}"
 					if settings.show_index:
-						string += f" == {task.index}"
-					self.add_string(string, x, y, curses.color_pair(3))
+						string += f" == {task.id}"
+					self.put(y, x, string, curses.color_pair(3))
 			else: self.draw_task(x, y, task, attr=is_completed_attr)
 		if len(self.tm.tasks) == 0:
 		# if no tasks exist
-			first_keybind_add_task = [keybind for keybind in settings.keybindings if settings.keybindings[keybind] == "add task"][0]
-			self.stdscr.addstr(2, 2, f"No tasks available. Press '{first_keybind_add_task}' to add a new task.")
+			first_keybind_add_task = [keybind for keybind in settings.keybindings if "add task" in settings.keybindings[keybind]][0]
+			self.put(2, 2, f"No tasks available. Press '{first_keybind_add_task}' to add a new task.")
 		# Top bar
 		title = " TerTask - 'h' for help ".ljust(self.width, " ")
 		if not settings.show_help_message:
 			title = " TerTask ".ljust(self.width, " ")
-		self.stdscr.addstr(0, 0, title, curses.A_BOLD)
-		self.stdscr.addstr(1, 0, "─" * self.width)
+		self.put(0, 0, title, curses.A_BOLD)
+		self.put(1, 0, "─" * self.width)
 
-		color = curses.color_pair(1)
-		if self.custom_type == "info": color = curses.color_pair(3)
-		elif self.custom_type == "warning": color = curses.color_pair(4)
-		elif self.custom_type == "error": color = curses.color_pair(6)
-		self.stdscr.addstr(0, self.width - len(self.custom_message) - 1, self.custom_message, color)
+		self.put(0, self.width - len(self.custom_message) - 1, self.custom_message, self.message_attr())
 
 		# Bottom bar
 		mode = "Normal"
@@ -237,17 +453,70 @@ class Application:
 		elif self.move_mode: mode = "Move"
 		elif self.command_mode: mode = "Command"
 		elif self.trash_mode: mode = "Trash"
-		if settings.show_current_mode: self.add_string(mode, self.width - (len(mode)+1), self.height - 1, curses.color_pair(4), move=False)
+		if self.tm.view_name != "list": mode = f"{mode} ({self.tm.view_name})"
+		if settings.show_current_mode: self.put(self.height - 1, self.width - (len(mode)+1), mode, curses.color_pair(4))
 
 		# Description panel
-		self.stdscr.addstr(self.height - 7, 0, "─" * self.width)
+		self.put(self.height - 7, 0, "─" * self.width)
 		if settings.info.description:
-			self.stdscr.addstr(self.height - 6, 2, "Description: ")
-			self.stdscr.addstr(self.height - 5, 2, self.tm.current_task.description)
+			self.put(self.height - 6, 2, "Description: ")
+			self.put(self.height - 5, 2, self.tm.current_task.description)
 
 		# Footer with created/modified info
-		if settings.info.created_at: self.stdscr.addstr(self.height - 3, 2, f"Created: {self.tm.current_task.created_at} ")
-		if settings.info.modified_at: self.stdscr.addstr(self.height - 2, 2, f"Modified: {self.tm.current_task.modified_at} ")
+		if settings.info.created_at: self.put(self.height - 3, 2, f"Created: {self.tm.current_task.created_at} ")
+		if settings.info.modified_at: self.put(self.height - 2, 2, f"Modified: {self.tm.current_task.modified_at} ")
+		self.flush_frame()
+
+	def message_attr(self) -> int:
+		if self.custom_type == "info": return curses.color_pair(3)
+		if self.custom_type == "warning": return curses.color_pair(4)
+		if self.custom_type == "error": return curses.color_pair(6)
+		return curses.color_pair(1)
+
+	def render_trash(self) -> None:
+		# only the rows on screen are looked up, a frame costs the same however big the trash grows
+		self.tm.trash.rows = max(1, self.height - 5)
+		self.put(1, 2, " Trash Menu - Press 't' to return ", curses.A_BOLD | curses.A_REVERSE)
+		if self.tm.deleted_count == 0:
+			self.put(2, 2, "No deleted tasks available.")
+		else:
+			self.put(2, 2, f"'R' recovers the selected task, 'd' deletes it forever — {self.tm.trash.position + 1}/{self.tm.deleted_count}"[:self.width - 3])
+			for idx, task in enumerate(self.tm.trash_tasks()):
+				line = f"{task.id} {task.mark} {task.title}" + (f" — {task.description}" if task.description else "")
+				if idx == self.tm.trash.selected: attr = curses.color_pair(3) | (curses.A_NORMAL if settings.use_colors else curses.A_REVERSE)
+				else: attr = curses.color_pair(2) if task.completed else curses.A_NORMAL
+				self.put(3 + idx, 2, line[:self.width - 3], attr)
+		self.put(0, self.width - len(self.custom_message) - 1, self.custom_message, self.message_attr())
+		if settings.show_current_mode: self.put(self.height - 1, self.width - 6, "Trash", curses.color_pair(4))
+		self.flush_frame()
+
+	def put(self, y: int, x: int, string: str, attr: int=curses.A_NORMAL) -> None:
+		# queues a string for the current frame, flush_frame() decides which rows reach the terminal
+		self.frame.setdefault(y, []).append((x, string, attr))
+
+	def flush_frame(self) -> None:
+		size = self.stdscr.getmaxyx()
+		if size != self.screen_size:
+			self.invalidate()
+			self.screen_size = size
+		for y in self.rows.keys() | self.frame.keys():
+			row = self.frame.get(y)
+			if row == self.rows.get(y): continue
+			# only rows whose content or attributes changed since the last frame are redrawn
+			self.stdscr.move(y, 0)
+			self.stdscr.clrtoeol()
+			for x, string, attr in row or []: self.stdscr.addstr(y, x, string, attr)
+		self.rows = self.frame
+		self.stdscr.noutrefresh()
+		curses.doupdate()
+
+	def invalidate(self, y: int | None=None) -> None:
+		# forgets what is on screen, either a single row or everything
+		if y is not None:
+			self.rows.pop(y, None)
+			return
+		self.rows = {}
+		self.stdscr.clear()
 
 	def main_loop(self, stdscr: curses.window) -> None:
 		self.stdscr = stdscr
@@ -277,9 +546,16 @@ class Application:
 			while True:
 				self.tm.max_items = self.height - 9
 				self.render()
-				key = self.stdscr.getch()
+				if self.stats is not None:
+					self.stats.lap("render")
+					self.stats.finish()
+				key = self.read_key()
+				if self.stats is not None: self.stats.start()
+				# everything since the last key press is one undo step, a whole move mode burst included
+				self.history.checkpoint()
 				self.custom_message = ""
 				self.custom_type = "info"
+				if settings.watch: self.sync()
 
 				whitelist = []
 				use_whitelist = True if self.rename_mode or self.move_mode else False
@@ -287,43 +563,83 @@ class Application:
 					whitelist = ["rename task"]
 				if self.move_mode:
 					whitelist = ["move task"]
+				if self.trash_mode and not use_whitelist:
+					whitelist, use_whitelist = TRASH_ACTIONS, True
 				actions = self.check_keys(key, whitelist=whitelist, use_whitelist=use_whitelist)
-				self.handle_actions(actions)
+				repeat = self.coalesce(key, actions)
+				if self.stats is not None: self.stats.lap("check_keys")
+				self.handle_actions(actions, repeat=repeat)
+				if self.stats is not None: self.stats.lap("handle_actions")
+				self.autosave()
+				# a held key never leaves getch waiting, timers that came due meanwhile run here
+				self.timers.run()
+				if self.stats is not None: self.stats.lap("autosave")
 		except Exception as e:
 			print("Unexpected error:", e)
 			print("Do you want to save your tasks? (Y/n) ", end="")
 			if input().lower() != "n": self.save()
-
-	def handle_actions(self, actions: list[str], extended: bool=False, only_extended: bool=False) -> None:
+		finally:
+			# also after ctrl-c or a crash, that is when the numbers are wanted most
+			if self.stats is not None and settings.stats_file: self.dump_stats(os.path.expanduser(settings.stats_file))
+
+	def read_key(self) -> int:
+		# waits for a key, running the timers that come due meanwhile, prompts and move mode still block on their own getch
+		while True:
+			self.stdscr.timeout(self.timers.timeout())
+			key = self.stdscr.getch()
+			self.stdscr.timeout(-1)
+			if key != -1: return key
+			if self.timers.run(): self.render()
+
+	def coalesce(self, key: int, actions: list[str]) -> int:
+		# a held key queues repeats faster than they are drawn, those already waiting are taken as one jump and one frame
+		if not actions or not NAVIGATION.issuperset(actions) or self.rename_mode or self.move_mode: return 1
+		repeat = 1
+		self.stdscr.nodelay(True)
+		try:
+			while (queued := self.stdscr.getch()) == key: repeat += 1
+		finally:
+			self.stdscr.nodelay(False)
+		# the first other key stays queued for the next round
+		if queued != -1: curses.ungetch(queued)
+		self.coalesced += repeat - 1
+		return repeat
+
+	def handle_actions(self, actions: list[str], extended: bool=False, only_extended: bool=False, repeat: int=1) -> None:
 		for action in actions:
 			if not only_extended:
 				if action == "rename task":
 					self.rename_mode = True
 				elif action == "move task":
-					self.move_mode = True
+					self.start_move()
 				elif action == "prev task":
-					self.tm.prev()
+					(self.tm.trash if self.trash_mode else self.tm).step(-repeat)
 				elif action == "next task":
-					self.tm.next()
+					(self.tm.trash if self.trash_mode else self.tm).step(repeat)
+				elif action == "recover task":
+					self.recover_selected()
 				elif action == "quit":
 					if not self.has_saved_tasks() and settings.prompt_unsaved:
 						if self.prompt(2, self.height - 1, "You have unsaved tasks. Do you want to save them? (Y/n) ", curses.color_pair(1), True).lower() != "n": self.save()
-					exit(0)
+					self.quit()
 				elif action == "force quit":
 					self.save()
-					exit(0)
+					self.quit()
 				elif action == "toggle task":
 					self.tm.current_task.toggle()
 				elif action == "add task":
-					self.tm.add("New Task")
-					self.tm.select_task(-1)
+					self.show_task(self.tm.add("New Task"))
 					self.rename_mode = True
 				elif action == "delete task":
+					if self.trash_mode and self.tm.trash_task is None: break
 					if settings.prompt_delete:
-						if self.prompt(2, self.height - 1, "Are you sure? (y/N) ", curses.color_pair(1), True).lower() != "y": break
-					self.tm.delete_current_task()
+						question = "Delete forever? (y/N) " if self.trash_mode else "Are you sure? (y/N) "
+						if self.prompt(2, self.height - 1, question, curses.color_pair(1), True).lower() != "y": break
+					if self.trash_mode: self.burn_selected()
+					else: self.tm.delete_current_task()
 				elif action == "force delete task":
-					self.tm.delete_current_task()
+					if self.trash_mode: self.burn_selected()
+					else: self.tm.delete_current_task()
 				elif action == "save tasks":
 					self.custom_message = "Saved tasks..."
 					self.save()
@@ -335,10 +651,12 @@ class Application:
 					self.command_mode = False
 				elif action == "help menu":
 					self.show_help()
+				elif action == "undo":
+					self.undo()
+				elif action == "redo":
+					self.undo(redo=True)
 				elif action == "trash menu":
 					self.trash_mode = not self.trash_mode
-					self.tm.selected = 0
-					self.render()
 			if extended:
 				actions = action.split(" ")
 				action = actions[0]
@@ -346,22 +664,20 @@ class Application:
 					case "q":
 						if not self.has_saved_tasks() and settings.prompt_unsaved:
 							if self.prompt(2, self.height - 1, "You have unsaved tasks. Are you sure? (y/N) ", curses.color_pair(1), True).lower() != "y": break
-						exit(0)
+						self.quit()
 					case "q!":
-						exit(0)
+						self.quit()
 					case "w":
 						self.save()
 						self.custom_message = "Saved tasks..."
 					case "wq" | "qw":
 						self.save()
-						exit(0)
+						self.quit()
 					case "export":
 						if len(actions) == 2:
 							self.custom_message = "Exporting tasks..."
 							self.custom_type = "info"
-							with open(actions[1], "w") as f:
-								f.truncate(0)
-								f.write(json.dumps([serialize_task(task) for task in self.tm._tasks]))
+							export_tasks(self.tm, actions[1])
 						else:
 							self.custom_type = "error"
 							self.custom_message = "Error: missing argument -> :export <file>"
@@ -375,27 +691,94 @@ class Application:
 							self.custom_message = "Error: missing argument -> :rename <new name...>"
 					case "delete" | "d" | "del":
 						if len(actions) > 1:
-							self.custom_message = f"Deleted task '{self.tm.get(int(actions[1])).title}'."
-							self.custom_type = "info"
-							self.tm.delete_task(int(actions[1]))
+							try:
+								task = self.tm.delete(int(actions[1]))
+								if task is None:
+									self.custom_type = "error"
+									self.custom_message = "Task not found"
+								else:
+									self.custom_message = f"Deleted task '{task.title}'."
+									self.custom_type = "info"
+							except ValueError:
+								self.custom_type = "error"
+								self.custom_message = "Invalid task ID"
 						else:
 							self.custom_message = f"Deleted task '{self.tm.current_task.title}'."
 							self.custom_type = "info"
 							self.tm.delete_current_task()
+					case "undo" | "u":
+						self.undo()
+					case "redo":
+						self.undo(redo=True)
 					case "move mode" | "mm":
-						self.move_mode = True
+						self.start_move()
+					case "view" | "v":
+						if len(actions) == 2 and actions[1] in VIEWS:
+							self.tm.set_view(actions[1])
+							self.custom_type = "info"
+							self.custom_message = f"Showing the {actions[1]} view"
+						else:
+							self.custom_type = "error"
+							self.custom_message = f"Error: expected a view -> :view <{'|'.join(VIEWS)}>"
 					case "a" | "add":
 						if len(actions) > 1:
 							self.custom_message = f"Added task '{' '.join(actions[1:])}'"
 							self.custom_type = "info"
-							self.tm.add(" ".join(actions[1:]))
-							self.tm.select_task(-1)
+							self.show_task(self.tm.add(" ".join(actions[1:])))
 						else:
 							self.custom_message = f"Added task 'New Task'"
 							self.custom_type = "info"
-							self.tm.add("New Task")
-							self.tm.select_task(-1)
+							self.show_task(self.tm.add("New Task"))
 							self.rename_mode = True
+					case "where":
+						try:
+							query = compile_query(" ".join(actions[1:]))
+							tasks = query.run(self.tm)
+						except QueryError as e:
+							self.custom_type = "error"
+							self.custom_message = f"Error: {e} -> :where <query> [| {'|'.join(QUERY_ACTIONS)}]"
+						else:
+							if query.action is None:
+								# the matches are cycled through like search results
+								self.search_results = [task.id for task in tasks if not task.deleted]
+								self.search_at = -1
+								self.next_search_result()
+							else:
+								self.custom_type = "info"
+								self.custom_message = f"{query.action.capitalize()}: {len(tasks)} task{'s' if len(tasks) != 1 else ''}"
+					case "list" | "ls":
+						if len(actions) == 1:
+							self.show_lists()
+						elif len(actions) == 2 and valid_name(actions[1]):
+							self.switch_list(actions[1])
+						else:
+							self.custom_type = "error"
+							self.custom_message = "Error: expected a list name of letters, digits, _ and - -> :list <name>"
+					case "search" | "/":
+						if len(actions) > 1:
+							self.search_results = [task.id for task in self.tm.search(" ".join(actions[1:]))]
+							self.search_at = -1
+						self.next_search_result()
+					case "stats":
+						if len(actions) > 1 and actions[1] in ("on", "off"):
+							self.stats = Stats() if actions[1] == "on" else None
+							self.custom_type = "info"
+							self.custom_message = f"Stats are {actions[1]}"
+						elif self.stats is None:
+							self.custom_type = "warning"
+							self.custom_message = "Stats are off -> :stats on"
+						elif len(actions) > 2 and actions[1] == "dump":
+							self.dump_stats(os.path.expanduser(" ".join(actions[2:])))
+							self.custom_type = "info"
+							self.custom_message = f"Wrote stats to {' '.join(actions[2:])}"
+						else:
+							self.show_stats()
+					case "autosave":
+						if self.autosaver is not None:
+							self.custom_message = f"Autosave: {self.autosaver.writes} writes, last {self.autosaver.last_latency * 1000:.1f} ms, queue {self.autosaver.queue_depth}"
+						else:
+							self.custom_type = "warning"
+							self.custom_message = "Autosave is disabled"
 					case "":
 						pass
 					case "h" | "help":
@@ -414,22 +797,20 @@ class Application:
 							self.custom_type = "info"
 							def info(*args: str): self.custom_message = " ".join([str(arg) for arg in args])
 							try:
-								exec(" ".join(actions[1:]), {"tasks": self.tm.tasks, "deleted_tasks": self.tm.deleted_tasks, "current_task": self.tm.current_task, "tm": self.tm, "info": info, "delete": self.tm._remove, "tasks_len": len(self.tm.tasks.copy())})
+								# applied as one batch, an exception undoes everything the code changed
+								with self.tm.batch():
+									exec(" ".join(actions[1:]), {"tasks": self.tm.tasks, "deleted_tasks": self.tm.deleted_tasks, "current_task": self.tm.current_task, "tm": self.tm, "info": info, "delete": self.tm._remove, "tasks_len": len(self.tm.tasks.copy())})
 							except Exception as e:
 								self.custom_type = "error"
-								self.custom_message = f"Error: {e}"
+								self.custom_message = f"Error: {e} (changes undone)"
 						else:
 							self.custom_type = "error"
 							self.custom_message = "Error: missing argument -> :run <python code...>"
 					case "recover" | "rev":
 						try:
-							task_id = int(actions[1])
-							for task in self.tm.deleted_tasks:
-								if task.index == task_id:
-									task.restore()
-									self.tm._index_tasks()
-									self.render()
-									return
+							if self.tm.restore(int(actions[1])) is not None:
+								self.render()
+								return
 							self.custom_type = "error"
 							self.custom_message = "Task not found"
 						except (IndexError, ValueError):
@@ -437,12 +818,9 @@ class Application:
 							self.custom_message = "Invalid task ID"
 					case "burn":
 						try:
-							task_id = int(actions[1])
-							for idx, task in enumerate(self.tm._tasks):
-								if task.index == task_id:
-									self.tm._tasks.pop(idx)
-									self.render()
-									return
+							if self.tm.burn(int(actions[1])) is not None:
+								self.render()
+								return
 							self.custom_type = "error"
 							self.custom_message = "Task not found"
 						except (IndexError, ValueError):
@@ -454,11 +832,10 @@ class Application:
 						self.custom_message = "Error: unknown command"
 
 	def check_keys(self, key: int, blacklist: list[str]=[], whitelist: list[str]=[], use_whitelist: bool=False) -> list[str]:
-		actions = []
-		for action in EVENTS:
-			is_not_disabled = (action not in blacklist) if not use_whitelist else (action in whitelist)
-			actions.append(action) if action in self.check_key(key, action, is_not_disabled) else None
-		return actions if len(actions) != 0 else [] # return empty list if no actions are found
+		actions = self.dispatch.get(key)
+		if not actions: return []
+		if use_whitelist: return [action for action in actions if action in whitelist]
+		return [action for action in actions if action not in blacklist]
 
 	def request_input(self) -> None:
 		curses.curs_set(2)
@@ -472,22 +849,13 @@ class Application:
 		os.write(sys.stdout.fileno(), bytes(sequence, 'utf-8'))
 
 	def draw_task(self, x: int, y: int, task: Task, selected: bool=False, attr: int=curses.A_NORMAL) -> None:
-		self.stdscr.addstr(y, x, f"{task.mark} {str(task.title)}", curses.color_pair(3) | attr if selected else attr)
-
-	def check_key(self, key: int, action: str, is_not_disabled: bool) -> list[str]:
-		return self.keyevent(key) if (action in self.keyevent(key) and is_not_disabled) else [""]
+		self.put(y, x, f"{task.mark} {str(task.title)}", curses.color_pair(3) | attr if selected else attr)
 
 	def create_folder_if_missing(self, path: str) -> None:
 		if not os.path.exists(path): os.makedirs(path)
 
-	def open_json(self, path: str) -> list[dict]:
-		with open(path, "r") as f:
-			return json.load(f)
-
 	def has_saved_tasks(self) -> bool:
-		old_tasks = self.open_json(self.save_path)
-		new_tasks = [serialize_task(task) for task in self.tm._tasks]
-		return str(old_tasks) == str(new_tasks)
+		return not self.tm.has_unsaved_changes
 
 	def input(self, x: int, y: int, prompt_string: str, attr: int, starting_offset: int=0, offset: int=3, prompt_attr: int=curses.A_NORMAL, placeholder: str="", placeholder_attr: int|None=None) -> str:
 		self.add_string(prompt_string, x, y, attr)
@@ -515,6 +883,7 @@ class Application:
 		self.stdscr.addstr(y, x, string, attr)
 		if move: self.stdscr.move(y, x + len(string) + offset)
 		self.stdscr.refresh()
+		self.invalidate(y)
 
 	@property
 	def height(self) -> int: return self.stdscr.getmaxyx()[0]
@@ -0,0 +1,214 @@
+import re
+from functools import lru_cache
+from operator import eq, ge, gt, le, lt, ne
+from typing import Callable
+
+from search import tokenize
+from task import Task, TaskManager, parse_time
+
+# a filter language for :where and cli.py where, compiled into closures instead of being run through exec
+#   query  := expr ["|" action]
+#   expr   := term ("or" term)*          term := factor ("and" factor)*
+#   factor := "not" factor | "(" expr ")" | flag | field op value
+# flags are checked, open and deleted, a query that never mentions deleted only looks at active tasks
+# ops are = != < <= > >=, ~ for a case insensitive substring and has for whole words (answered by the search index)
+
+class QueryError(ValueError):
+	pass
+
+TOKEN = re.compile(r"""\s*(?:"((?:[^"\\]|\\.)*)"|'([^']*)'|(<=|>=|!=|==|=|<|>|~|\(|\)|\|)|([^\s()<>=!~|"']+))""")
+
+FIELDS: dict[str, Callable[[Task], object]] = {
+	"title": lambda task: task.title,
+	"description": lambda task: task.description,
+	"text": lambda task: f"{task.title} {task.description}",
+	"id": lambda task: task.id,
+	"created_at": lambda task: task.created,
+	"updated_at": lambda task: task.updated,
+}
+TEXT_FIELDS = ("title", "description", "text")
+TIME_FIELDS = ("created_at", "updated_at")
+
+FLAGS: dict[str, Callable[[Task], bool]] = {
+	"checked": lambda task: task.checked,
+	"open": lambda task: not task.checked and not task.deleted,
+	"deleted": lambda task: task.deleted,
+}
+
+OPS = {"=": eq, "==": eq, "!=": ne, "<": lt, "<=": le, ">": gt, ">=": ge}
+
+# each action skips the tasks it would not change, so they stay out of the batch and the undo step
+ACTIONS: dict[str, Callable[[TaskManager, Task], object]] = {
+	"delete": lambda tm, task: task.deleted or task.delete(),
+	"recover": lambda tm, task: task.deleted and task.restore(),
+	"burn": lambda tm, task: tm.burn(task.id),
+	"check": lambda tm, task: task.checked or task.check(),
+	"uncheck": lambda tm, task: task.checked and task.uncheck(),
+	"toggle": lambda tm, task: task.toggle(),
+}
+
+class Query:
+	def __init__(self, predicate: Callable[[Task], bool], action: str | None, deleted: bool | None, checked: bool | None, words: str) -> None:
+		self.predicate = predicate
+		self.action = action
+		# what the indexes can narrow the candidates down to, the predicate still checks every candidate
+		self.deleted = deleted
+		self.checked = checked
+		self.words = words
+
+	def select(self, tm: TaskManager) -> list[Task]:
+		return [task for task in tm.matching(self.deleted, self.checked, self.words) if self.predicate(task)]
+
+	def run(self, tm: TaskManager) -> list[Task]:
+		# the matches, with the action applied to all of them in one batch: one undo step, one save and at most one compaction
+		tasks = self.select(tm)
+		if self.action is None or not tasks: return tasks
+		action = ACTIONS[self.action]
+		with tm.batch():
+			for task in tasks: action(tm, task)
+		return tasks
+
+@lru_cache(maxsize=64)
+def compile_query(text: str) -> Query:
+	# parsed once per distinct text, running a query again only runs its closures
+	parser = Parser(text)
+	node = parser.expr()
+	action = None
+	if parser.peek() == "|":
+		parser.take()
+		action = parser.take()
+		if action not in ACTIONS: raise QueryError(f"unknown action '{action}', expected one of {', '.join(ACTIONS)}")
+	if parser.peek() is not None: raise parser.unexpected()
+	if not mentions(node, "deleted"): node = ("and", node, ("not", ("flag", "deleted")))
+	deleted, checked, words = plan(node)
+	return Query(build(node), action, deleted, checked, " ".join(words))
+
+class Parser:
+	def __init__(self, text: str) -> None:
+		self.tokens: list[tuple[str, bool]] = []
+		pos = 0
+		text = text.rstrip()
+		while pos < len(text):
+			match = TOKEN.match(text, pos)
+			if match is None or match.end() == pos: raise QueryError(f"unexpected '{text[pos:].strip()}'")
+			double, single, op, word = match.groups()
+			# quoted strings are never keywords
+			if op is not None or word is not None: self.tokens.append((op or word, False))
+			else: self.tokens.append((re.sub(r"\\(.)", r"\1", double) if double is not None else single, True))
+			pos = match.end()
+		self.pos = 0
+
+	def peek(self) -> str | None:
+		# the next keyword or operator, "" for a quoted string and None at the end
+		if self.pos >= len(self.tokens): return None
+		text, quoted = self.tokens[self.pos]
+		return "" if quoted else text
+
+	def unexpected(self) -> QueryError:
+		if self.pos >= len(self.tokens): return QueryError("unexpected end of query")
+		return QueryError(f"unexpected '{self.tokens[self.pos][0]}'")
+
+	def take(self) -> str:
+		if self.pos >= len(self.tokens): raise QueryError("unexpected end of query")
+		self.pos += 1
+		return self.tokens[self.pos - 1][0]
+
+	def expr(self) -> tuple:
+		node = self.term()
+		while self.peek() == "or":
+			self.take()
+			node = ("or", node, self.term())
+		return node
+
+	def term(self) -> tuple:
+		node = self.factor()
+		while self.peek() == "and":
+			self.take()
+			node = ("and", node, self.factor())
+		return node
+
+	def factor(self) -> tuple:
+		token = self.peek()
+		if token == "not":
+			self.take()
+			return ("not", self.factor())
+		if token == "(":
+			self.take()
+			node = self.expr()
+			if self.peek() != ")": raise QueryError("missing ')'")
+			self.take()
+			return node
+		if token in FLAGS:
+			self.take()
+			return ("flag", token)
+		if token in FIELDS:
+			self.take()
+			op = self.take()
+			if op not in OPS and op not in ("~", "has"): raise QueryError(f"expected an operator after '{token}', got '{op}'")
+			return ("cmp", token, op, value(token, op, self.take()))
+		raise self.unexpected()
+
+def value(field: str, op: str, text: str):
+	if op in ("~", "has"):
+		if field not in TEXT_FIELDS: raise QueryError(f"'{op}' only works on {', '.join(TEXT_FIELDS)}")
+		return text
+	if field in TIME_FIELDS:
+		# epoch milliseconds or an ISO date, 2026-01-01 is midnight local time
+		if text.isdigit(): return int(text)
+		try:
+			return parse_time(text)
+		except ValueError:
+			raise QueryError(f"'{text}' is not a date")
+	if field == "id":
+		try:
+			return int(text)
+		except ValueError:
+			raise QueryError(f"'{text}' is not a task id")
+	return text
+
+def build(node: tuple) -> Callable[[Task], bool]:
+	match node:
+		case ("and", left, right):
+			a, b = build(left), build(right)
+			return lambda task: a(task) and b(task)
+		case ("or", left, right):
+			a, b = build(left), build(right)
+			return lambda task: a(task) or b(task)
+		case ("not", inner):
+			a = build(inner)
+			return lambda task: not a(task)
+		case ("flag", name):
+			return FLAGS[name]
+		case ("cmp", field, "~", text):
+			get, needle = FIELDS[field], text.lower()
+			return lambda task: needle in get(task).lower()
+		case ("cmp", field, "has", text):
+			get, words = FIELDS[field], tokenize(text)
+			return lambda task: words <= tokenize(get(task))
+		case ("cmp", field, op, expected):
+			get, compare = FIELDS[field], OPS[op]
+			return lambda task: compare(get(task), expected)
+	raise QueryError(f"cannot compile {node}")
+
+def mentions(node: tuple, flag: str) -> bool:
+	if node[0] == "flag": return node[1] == flag
+	return any(mentions(child, flag) for child in node[1:] if isinstance(child, tuple))
+
+def plan(node: tuple) -> tuple[bool | None, bool | None, list[str]]:
+	# deleted, checked and words every match has, read off the terms joined by a top level and
+	deleted, checked, words = None, None, []
+	terms, stack = [], [node]
+	while stack:
+		term = stack.pop()
+		if term[0] == "and": stack += [term[1], term[2]]
+		else: terms.append(term)
+	for term in terms:
+		match term:
+			case ("flag", "deleted"): deleted = True
+			case ("not", ("flag", "deleted")): deleted = False
+			case ("flag", "checked"): checked = True
+			case ("not", ("flag", "checked")): checked = False
+			case ("flag", "open"): deleted, checked = False, False
+			# text without a word matches every task, the index would answer with none
+			case ("cmp", _, "has", text) if tokenize(text): words.append(text)
+	return deleted, checked, words
@@ -0,0 +1,37 @@
+import re
+
+TOKEN = re.compile(r"\w+")
+EMPTY: frozenset[int] = frozenset()
+
+def tokenize(text: str) -> frozenset[str]:
+	return frozenset(TOKEN.findall(text.lower()))
+
+class SearchIndex:
+	# inverted index from lowercase words to task ids, updated per edit instead of rescanning titles
+	def __init__(self) -> None:
+		self.postings: dict[str, set[int]] = {}
+		self.tokens: dict[int, frozenset[str]] = {}
+
+	def __len__(self) -> int: return len(self.tokens)
+
+	def index(self, task_id: int, text: str) -> None:
+		new = tokenize(text)
+		old = self.tokens.get(task_id, EMPTY)
+		for token in old - new: self._discard(token, task_id)
+		for token in new - old: self.postings.setdefault(token, set()).add(task_id)
+		self.tokens[task_id] = new
+
+	def remove(self, task_id: int) -> None:
+		for token in self.tokens.pop(task_id, EMPTY): self._discard(token, task_id)
+
+	def _discard(self, token: str, task_id: int) -> None:
+		ids = self.postings[token]
+		ids.discard(task_id)
+		if not ids: del self.postings[token]
+
+	def query(self, text: str) -> set[int]:
+		# ids of the tasks containing every word, intersected starting from the rarest one
+		terms = tokenize(text)
+		if not terms: return set()
+		postings = sorted((self.postings.get(term, EMPTY) for term in terms), key=len)
+		return set(postings[0]).intersection(*postings[1:])
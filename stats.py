@@ -0,0 +1,88 @@
+import json
+import time
+
+BARS = " ▁▂▃▄▅▆▇█"
+
+class Histogram:
+	# power of two buckets over microseconds, recording is O(1) and never allocates
+	BUCKETS = 24
+
+	def __init__(self) -> None:
+		self.counts = [0] * self.BUCKETS
+		self.count = 0
+		self.total_ns = 0
+		self.max_ns = 0
+
+	def record(self, ns: int) -> None:
+		# bucket b holds latencies below 2**b microseconds
+		self.counts[min((ns // 1000).bit_length(), self.BUCKETS - 1)] += 1
+		self.count += 1
+		self.total_ns += ns
+		if ns > self.max_ns: self.max_ns = ns
+
+	def percentile(self, pct: float) -> int:
+		# upper bound in microseconds of the bucket holding the percentile, capped at the slowest sample
+		seen = 0
+		for bucket, count in enumerate(self.counts):
+			seen += count
+			if count and seen >= pct * self.count: return min(1 << bucket, -(-self.max_ns // 1000))
+		return 0
+
+	def bars(self) -> str:
+		# one character per bucket up to the slowest one, scaled to the fullest bucket
+		last = max((bucket for bucket, count in enumerate(self.counts) if count), default=0)
+		peak = max(self.counts) or 1
+		return "".join(BARS[-(-count * (len(BARS) - 1) // peak)] for count in self.counts[:last + 1])
+
+	def summary(self) -> dict:
+		return {
+			"count": self.count,
+			"mean_us": round(self.total_ns / self.count / 1000, 1) if self.count else 0,
+			"p50_us": self.percentile(0.5),
+			"p99_us": self.percentile(0.99),
+			"max_us": round(self.max_ns / 1000, 1),
+			"buckets": self.counts,
+		}
+
+class Stats:
+	# per key latencies from getch returning to the next frame, split into the phases of main_loop
+	PHASES = ("key", "check_keys", "handle_actions", "autosave", "render", "save")
+
+	def __init__(self) -> None:
+		self.histograms = {phase: Histogram() for phase in self.PHASES}
+		self.counters: dict[str, int] = {}
+		self._start: int | None = None
+		self._mark = 0
+
+	def record(self, phase: str, ns: int) -> None:
+		self.histograms[phase].record(ns)
+
+	def start(self) -> None:
+		self._start = self._mark = time.perf_counter_ns()
+
+	def lap(self, phase: str) -> None:
+		# time since the key arrived or the previous lap
+		if self._start is None: return
+		now = time.perf_counter_ns()
+		self.histograms[phase].record(now - self._mark)
+		self._mark = now
+
+	def finish(self) -> None:
+		if self._start is None: return
+		self.histograms["key"].record(time.perf_counter_ns() - self._start)
+		self._start = None
+
+	def report(self) -> dict:
+		return {"histograms": {phase: histogram.summary() for phase, histogram in self.histograms.items()}, "counters": dict(self.counters)}
+
+	def lines(self) -> list[str]:
+		lines = [f"{'phase':<15} {'count':>7} {'mean':>9} {'p50':>8} {'p99':>8} {'max':>9}  histogram (1us, 2us, 4us, ...)"]
+		for phase, histogram in self.histograms.items():
+			summary = histogram.summary()
+			lines.append(f"{phase:<15} {summary['count']:>7} {summary['mean_us']:>7}us {summary['p50_us']:>6}us {summary['p99_us']:>6}us {summary['max_us']:>7}us  {histogram.bars()}")
+		lines.append("")
+		lines.extend(f"{name:<15} {value:>7}" for name, value in self.counters.items())
+		return lines
+
+	def dump(self, path: str) -> None:
+		with open(path, "w") as f: f.write(json.dumps(self.report(), indent=2))
@@ -0,0 +1,742 @@
+import json
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from itertools import accumulate
+from contextlib import contextmanager
+from queue import Queue
+from typing import Callable, Iterable, Iterator
+from array import array
+from task import Task, TaskManager, TaskSource, deserialize_task, serialize_task, unique_ids
+
+try:
+	import fcntl
+except ImportError:
+	# no advisory locks on this platform, saves still replace the file atomically
+	fcntl = None
+
+class SaveConflict(Exception):
+	pass
+
+@contextmanager
+def locked(path: str, exclusive: bool=True) -> Iterator[None]:
+	# advisory lock every tertask instance takes before touching the save file, next to it so replacing the file keeps it
+	if fcntl is None:
+		yield
+		return
+	with open(os.path.splitext(path)[0] + ".lock", "a") as f:
+		fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+		yield
+
+def file_signature(path: str) -> tuple[int, int, int] | None:
+	# changes with every write, an atomic replace gives a new inode even within the same mtime tick
+	try:
+		st = os.stat(path)
+	except FileNotFoundError:
+		return None
+	return st.st_mtime_ns, st.st_size, st.st_ino
+
+def write_atomic(path: str, data: bytes) -> None:
+	# writes next to the target and swaps it in, a crash never leaves a half written file behind
+	tmp_path = f"{path}.tmp"
+	with open(tmp_path, "wb") as f:
+		f.write(data)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(tmp_path, path)
+
+def encode_tasks(next_id: int, tasks: list[dict | bytes], **extra) -> bytes:
+	# same bytes json.dumps gives for the serialize() document, undecoded tasks are copied as they are
+	body = b", ".join(task if isinstance(task, bytes) else json.dumps(task).encode() for task in tasks)
+	tail = b"".join(f", {json.dumps(key)}: {json.dumps(value)}".encode() for key, value in extra.items())
+	return b'{"next_id": %d, "tasks": [%s]%s}' % (next_id, body, tail)
+
+def read_tasks(path: str, tm: TaskManager, lazy: bool=False, columnar: bool=False) -> dict:
+	# loads the save file into tm and returns the other fields of the document
+	if lazy:
+		source = LazyTasks.open(path)
+		if source is not None and unique_ids(source.ids):
+			tm.load_source(source, source.next_id)
+			return source.extra
+	with open(path, "r") as f:
+		data = json.load(f)
+	tm.load_serialized_tasks(data, columnar)
+	return {key: value for key, value in data.items() if key != "tasks"} if isinstance(data, dict) else {}
+
+class LazyTasks:
+	# a memory mapped save file, only ids, deleted flags and record offsets are kept in memory
+	HEADER = re.compile(rb'\s*\{\s*"next_id"\s*:\s*(\d+)\s*,\s*"tasks"\s*:\s*\[')
+	TAIL = re.compile(rb'"deleted"\s*:\s*(true|false)\s*,\s*"id"\s*:\s*(-?\d+)\s*\}')
+	TRAILER = re.compile(rb'\s*\]\s*(.*)\}\s*$', re.DOTALL)
+	ID_KEY = re.compile(rb'"id"\s*:')
+
+	def __init__(self, data: mmap.mmap, start: int, ends: array, ids: array, deleted: bytearray, next_id: int, extra: dict) -> None:
+		self._data = data
+		self._start = start
+		self._ends = ends
+		self.ids = ids
+		self.deleted = deleted
+		self.next_id = next_id
+		self.extra = extra
+
+	@classmethod
+	def open(cls, path: str) -> "LazyTasks | None":
+		# None when the file is missing or not laid out the way encode_tasks writes it
+		if not os.path.exists(path) or os.path.getsize(path) == 0: return None
+		with open(path, "rb") as f:
+			data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		header = cls.HEADER.match(data)
+		if header is None: return None
+		tails = cls.TAIL.findall(data, header.end())
+		ends = array("q", [match.end() for match in cls.TAIL.finditer(data, header.end())])
+		last = ends[-1] if ends else header.end()
+		trailer = cls.TRAILER.match(data, last)
+		# every "id" key has to belong to a matched record, otherwise some record had another layout
+		if trailer is None or len(cls.ID_KEY.findall(data, header.end(), last)) != len(ends): return None
+		rest = trailer.group(1).strip()
+		extra = json.loads(b"{" + rest[1:] + b"}") if rest.startswith(b",") else {}
+		ids = array("q", [int(task_id) for _, task_id in tails])
+		deleted = bytearray(len(flag) == 4 for flag, _ in tails)
+		return cls(data, header.end(), ends, ids, deleted, int(header.group(1)), extra)
+
+	def __len__(self) -> int: return len(self._ends)
+
+	def raw(self, idx: int) -> bytes:
+		start = self._data.find(b"{", self._ends[idx - 1] if idx else self._start)
+		return self._data[start:self._ends[idx]]
+
+	def load(self, idx: int) -> Task:
+		return deserialize_task(json.loads(self.raw(idx)))
+
+def _column(data: mmap.mmap, start: int, count: int) -> memoryview | array:
+	# count little endian int64 values, read in place where the machine is little endian too
+	if sys.byteorder == "little": return memoryview(data)[start:start + 8 * count].cast("q")
+	column = array("q", data[start:start + 8 * count])
+	column.byteswap()
+	return column
+
+class BinaryTasks:
+	# the binary save format, memory mapped, a task is decoded from its column entries when TaskManager asks for it
+	# little endian: a header, fixed width columns of count entries each and the utf-8 string heap
+	#   ids, created_at, updated_at, title ends, description ends (int64), flags (1 checked, 2 deleted)
+	# title i is heap[title_ends[i - 1]:title_ends[i]], the descriptions follow the titles
+	MAGIC = b"TTSK"
+	VERSION = 1
+	HEADER = struct.Struct("<4sHHqq") # magic, version, unused, next_id, count
+	SUFFIX = ".bin"
+	DELETED_FROM_FLAGS = bytes(flags >> 1 & 1 for flags in range(256))
+
+	def __init__(self, data: mmap.mmap, next_id: int, count: int) -> None:
+		self._data = data
+		self.next_id = next_id
+		offset = self.HEADER.size
+		self.ids, self.created, self.updated, self.title_ends, self.description_ends = (_column(data, offset + 8 * count * column, count) for column in range(5))
+		offset += 40 * count
+		self.flags = memoryview(data)[offset:offset + count]
+		self.deleted = bytearray(self.flags).translate(self.DELETED_FROM_FLAGS)
+		self._heap = offset + count
+
+	@classmethod
+	def open(cls, path: str) -> "BinaryTasks | None":
+		# None when the file is missing or not in this format
+		if not os.path.exists(path) or os.path.getsize(path) < cls.HEADER.size: return None
+		with open(path, "rb") as f:
+			data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		magic, version, _, next_id, count = cls.HEADER.unpack_from(data)
+		if magic != cls.MAGIC or version != cls.VERSION: return None
+		return cls(data, next_id, count)
+
+	def __len__(self) -> int: return len(self.flags)
+
+	def title(self, idx: int) -> bytes:
+		start = self.title_ends[idx - 1] if idx else 0
+		return self._data[self._heap + start:self._heap + self.title_ends[idx]]
+
+	def description(self, idx: int) -> bytes:
+		start = self.description_ends[idx - 1] if idx else (self.title_ends[-1] if len(self) else 0)
+		return self._data[self._heap + start:self._heap + self.description_ends[idx]]
+
+	def row(self, idx: int) -> tuple:
+		# the entry as encode_binary() takes it, the strings stay encoded
+		return self.ids[idx], self.flags[idx], self.created[idx], self.updated[idx], self.title(idx), self.description(idx)
+
+	def load(self, idx: int) -> Task:
+		flags = self.flags[idx]
+		task = Task(str(self.title(idx), "utf-8"), bool(flags & 1), str(self.description(idx), "utf-8"), self.ids[idx])
+		task._created_at, task._updated_at, task._deleted = self.created[idx], self.updated[idx], bool(flags & 2)
+		return task
+
+	def raw(self, idx: int) -> bytes:
+		return json.dumps(serialize_task(self.load(idx))).encode()
+
+def raw_records(entries: Iterable[Task | int], source: TaskSource | None) -> list[dict | bytes]:
+	# TaskManager.raw_tasks() of what stored() or copy_stored() gave, undecoded tasks stay as their source bytes
+	return [serialize_task(entry) if isinstance(entry, Task) else source.raw(entry) for entry in entries]
+
+def binary_rows(entries: Iterable[Task | int], source: TaskSource | None) -> list[tuple]:
+	# the stored tasks as encode_binary() rows, strings are encoded by encode_binary()
+	rows = []
+	for entry in entries:
+		if isinstance(entry, int):
+			if isinstance(source, BinaryTasks):
+				rows.append(source.row(entry))
+				continue
+			entry = source.load(entry)
+		rows.append((entry.id, entry.checked | entry.deleted << 1, entry.created, entry.updated, entry.title, entry.description))
+	return rows
+
+def encode_binary(next_id: int, rows: list[tuple]) -> bytes:
+	count = len(rows)
+	ids, flags, created, updated, titles, descriptions = zip(*rows) if rows else ((),) * 6
+	titles = [title if isinstance(title, bytes) else title.encode() for title in titles]
+	descriptions = [description if isinstance(description, bytes) else description.encode() for description in descriptions]
+	title_ends = array("q", accumulate(map(len, titles)))
+	description_ends = array("q", accumulate(map(len, descriptions), initial=title_ends[-1] if count else 0))[1:]
+	columns = [array("q", ids), array("q", created), array("q", updated), title_ends, description_ends]
+	if sys.byteorder == "big":
+		for column in columns: column.byteswap()
+	header = BinaryTasks.HEADER.pack(BinaryTasks.MAGIC, BinaryTasks.VERSION, 0, next_id, count)
+	return b"".join([header, *(column.tobytes() for column in columns), bytes(flags), *titles, *descriptions])
+
+def export_tasks(tm: TaskManager, path: str) -> None:
+	# json, or the binary format for a .bin path
+	if path.endswith(BinaryTasks.SUFFIX): write_atomic(path, encode_binary(tm.next_id, binary_rows(tm.stored(), tm.source)))
+	else: write_atomic(path, encode_tasks(tm.next_id, tm.raw_tasks()))
+
+def read_document(path: str) -> dict | list:
+	# a save or export file of either format as it would be serialized
+	source = BinaryTasks.open(path)
+	if source is not None: return {"next_id": source.next_id, "tasks": [serialize_task(source.load(idx)) for idx in range(len(source))]}
+	with open(path) as f: return json.load(f)
+
+class Store(ABC):
+	# persistence backend of a TaskManager, load() attaches it so it can follow every mutation
+	# files other instances may write, watched through their signature, empty when the backend locks itself
+	paths: tuple[str, ...] = ()
+	# signatures of the paths at the last load, save or merge, None for a store that never read them
+	synced: tuple | None = None
+	# id -> updated_at on disk of the tasks edited since the last save, None for tasks added since
+	touched: dict[int, int | None] | None = None
+	merging = False
+
+	def __init__(self) -> None:
+		# touched as it was when the last write was prepared, handed back by failed()
+		self.saving: dict[int, int | None] = {}
+
+	def load(self, tm: TaskManager) -> None:
+		with locked(self.paths[0], exclusive=False):
+			self.synced = self.stat()
+			self.read(tm)
+		self.attach(tm, follow=True)
+
+	@abstractmethod
+	def read(self, tm: TaskManager) -> None:
+		# loads what is on disk into tm, without following it
+		...
+
+	@abstractmethod
+	def prepare(self, tm: TaskManager) -> Callable[[], None] | None:
+		# takes what has to be written now and returns the disk part, which may run on another thread
+		...
+
+	def save(self, tm: TaskManager) -> None:
+		job = self.prepare(tm)
+		if job is not None: job()
+
+	def close(self) -> None:
+		# releases what the store keeps open, after its last save
+		pass
+
+	def attach(self, tm: TaskManager, follow: bool=False) -> None:
+		tm.store = self
+		if follow: tm.subscribe(self.record)
+		if self.paths:
+			self.touched, self.saving, self._guessed = {}, {}, set()
+			tm.subscribe(self._touch)
+
+	def record(self, event: str, task: Task | None, old) -> None:
+		pass
+
+	def failed(self) -> None:
+		# a job returned by prepare() raised, the next prepare() has to write everything again
+		if self.touched is not None: self.touched = {**self.touched, **self.saving}
+
+	def stat(self) -> tuple:
+		return tuple(file_signature(path) for path in self.paths)
+
+	def changed(self) -> bool:
+		# another instance wrote since the last load, save or merge, a stat() per file
+		return self.synced is not None and self.stat() != self.synced
+
+	def _touch(self, event: str, task: Task | None, old) -> None:
+		if task is None or self.merging: return
+		if event == "updated_at" and (task.id not in self.touched or task.id in self._guessed):
+			self.touched[task.id] = old
+			self._guessed.discard(task.id)
+		elif task.id not in self.touched:
+			# batched events arrive after the batch, the updated_at event that may follow has the saved value
+			self.touched[task.id] = None if event == "add" else task.updated
+			if event != "add": self._guessed.add(task.id)
+
+	def _snapshot(self) -> None:
+		# called by prepare(), what was edited until now goes into the write that is being prepared
+		if self.touched is not None: self.saving, self.touched, self._guessed = self.touched, {}, set()
+
+	def _write(self, write: Callable[[], None]) -> None:
+		# never overwrites what another instance saved after our last read, merge() has to see it first
+		with locked(self.paths[0]):
+			if self.synced is not None and self.stat() != self.synced: raise SaveConflict("the save file was changed by another instance")
+			write()
+			self.synced = self.stat()
+
+	def merge(self, tm: TaskManager) -> list[Task]:
+		# folds what other instances saved into tm task by task, returns the tasks both sides changed
+		disk = TaskManager()
+		with locked(self.paths[0], exclusive=False):
+			synced = self.stat()
+			self.read(disk)
+		unsaved = tm.has_unsaved_changes
+		conflicts: list[Task] = []
+		seen = set()
+		self.merging = True
+		try:
+			with tm.batch():
+				tm.reserve_ids(disk.next_id)
+				for theirs in disk.all_tasks:
+					seen.add(theirs.id)
+					ours, data = tm.get(theirs.id), serialize_task(theirs)
+					if theirs.id not in self.touched:
+						if ours is None or serialize_task(ours) != data: tm.load_serialized_task(data)
+						continue
+					base = self.touched[theirs.id]
+					if base is None:
+						# both added a task under the same id, ours moves to a new one
+						if ours is not None:
+							self.touched[tm.rekey(ours).id] = self.touched.pop(theirs.id)
+						tm.load_serialized_task(data)
+						continue
+					if theirs.updated == base: continue
+					# both changed it, the newer edit wins and the older one stays a step back in the undo history
+					conflicts.append(theirs)
+					if ours is None or theirs.updated > ours.updated:
+						tm.load_serialized_task(data)
+						del self.touched[theirs.id]
+					else:
+						self.touched[theirs.id] = theirs.updated
+				for task in tm.all_tasks:
+					if task.id in seen: continue
+					if task.id not in self.touched: tm.burn(task.id)
+					elif self.touched[task.id] is not None:
+						# edited here but burned there, kept and saved again as a new task
+						conflicts.append(task)
+						self.touched[task.id] = None
+		finally:
+			self.merging = False
+		self.synced = synced
+		if not unsaved: tm.mark_saved()
+		return [tm.get(task.id) or task for task in conflicts]
+
+	def save_merged(self, tm: TaskManager) -> list[Task]:
+		# save() that first merges what other instances saved, returns the conflicting tasks
+		conflicts: list[Task] = []
+		for _ in range(3):
+			if self.changed(): conflicts += self.merge(tm)
+			try:
+				self.save(tm)
+				return conflicts
+			except SaveConflict:
+				# someone saved between the merge and the write
+				self.failed()
+		raise SaveConflict("the save file keeps changing")
+
+	def query(self, deleted: bool | None=None, checked: bool | None=None, offset: int=0, limit: int | None=None) -> list[int] | None:
+		# ids of the matching tasks in list order, None leaves filtering to TaskManager
+		return None
+
+class Journal(Store):
+	def __init__(self, path: str, compact_after: int=1000, lazy: bool=False, columnar: bool=False) -> None:
+		super().__init__()
+		self.path = path
+		self.lazy = lazy
+		self.columnar = columnar
+		self.journal_path = os.path.splitext(path)[0] + ".journal"
+		self.paths = (path, self.journal_path)
+		self.compact_after = compact_after
+		self.pending: list[dict] = []
+		self.seq = 0
+		self.records = 0
+		self.needs_snapshot = False
+
+	def read(self, tm: TaskManager) -> None:
+		snapshot_seq = 0
+		if os.path.exists(self.path): snapshot_seq = read_tasks(self.path, tm, self.lazy, self.columnar).get("seq", 0)
+		self.seq = snapshot_seq
+		self.records = 0
+		if os.path.exists(self.journal_path): self._replay(tm, snapshot_seq)
+
+	def merge(self, tm: TaskManager) -> list[Task]:
+		# the records of the other instance are already in the journal, a snapshot replaces them with the merged list
+		conflicts = super().merge(tm)
+		self.needs_snapshot = True
+		return conflicts
+
+	def _replay(self, tm: TaskManager, snapshot_seq: int) -> None:
+		good = 0
+		with open(self.journal_path, "rb") as f, tm.batch():
+			for line in f:
+				# torn write, everything after the last complete record is dropped
+				if not line.endswith(b"\n"): break
+				try:
+					record = json.loads(line)
+				except ValueError:
+					break
+				good += len(line)
+				self.records += 1
+				if record["seq"] <= snapshot_seq: continue # already folded into the snapshot
+				self.seq = record["seq"]
+				self.apply(tm, record)
+		if good != os.path.getsize(self.journal_path):
+			with open(self.journal_path, "r+b") as f: f.truncate(good)
+
+	def apply(self, tm: TaskManager, record: dict) -> None:
+		match record["op"]:
+			case "put": tm.load_serialized_task(record["task"])
+			case "move": tm.move_to(record["id"], record["to"])
+			case "burn": tm.burn(record["id"])
+
+	def record(self, event: str, task: Task | None, old) -> None:
+		if task is None:
+			# the whole order was replaced, only a snapshot can describe that
+			self.needs_snapshot = True
+			return
+		if event == "move":
+			record = {"op": "move", "id": task.id, "to": task._manager.position(task)}
+		elif event == "burn":
+			record = {"op": "burn", "id": task.id}
+		else:
+			record = {"op": "put", "task": serialize_task(task)}
+			last = self.pending[-1] if self.pending else None
+			# consecutive edits of the same task collapse into one record
+			if last is not None and last["op"] == "put" and last["task"]["id"] == task.id:
+				last["task"] = record["task"]
+				return
+		self.pending.append(record)
+
+	def failed(self) -> None:
+		super().failed()
+		self.needs_snapshot = True
+
+	def prepare(self, tm: TaskManager) -> Callable[[], None] | None:
+		if self.needs_snapshot or self.records + len(self.pending) > self.compact_after:
+			return self.compact(tm)
+		if not self.pending: return None
+		self._snapshot()
+		lines = []
+		for record in self.pending:
+			self.seq += 1
+			record["seq"] = self.seq
+			lines.append(json.dumps(record) + "\n")
+		self.records += len(self.pending)
+		self.pending = []
+		def write() -> None:
+			with open(self.journal_path, "a") as f:
+				f.write("".join(lines))
+				f.flush()
+				os.fsync(f.fileno())
+		return lambda: self._write(write)
+
+	def compact(self, tm: TaskManager) -> Callable[[], None]:
+		# folds the journal back into the snapshot, the snapshot seq makes a replay after a crash here safe
+		self.seq += len(self.pending)
+		next_id, tasks, source, seq = tm.next_id, tm.copy_stored(), tm.source, self.seq
+		self.pending = []
+		self.records = 0
+		self.needs_snapshot = False
+		self._snapshot()
+		def write() -> None:
+			write_atomic(self.path, encode_tasks(next_id, raw_records(tasks(), source), seq=seq))
+			with open(self.journal_path, "w"): pass
+		return lambda: self._write(write)
+
+class JsonFile(Store):
+	def __init__(self, path: str, lazy: bool=False, columnar: bool=False) -> None:
+		super().__init__()
+		self.path = path
+		self.paths = (path,)
+		self.lazy = lazy
+		self.columnar = columnar
+
+	def read(self, tm: TaskManager) -> None:
+		if os.path.exists(self.path): read_tasks(self.path, tm, self.lazy, self.columnar)
+
+	def prepare(self, tm: TaskManager) -> Callable[[], None]:
+		next_id, tasks, source = tm.next_id, tm.copy_stored(), tm.source
+		self._snapshot()
+		return lambda: self._write(lambda: write_atomic(self.path, encode_tasks(next_id, raw_records(tasks(), source))))
+
+class BinaryFile(Store):
+	# mapped on load, opening does not decode a single task
+	def __init__(self, path: str) -> None:
+		super().__init__()
+		self.path = path
+		self.paths = (path,)
+
+	def read(self, tm: TaskManager) -> None:
+		source = BinaryTasks.open(self.path)
+		if source is not None: tm.load_source(source, source.next_id)
+
+	def prepare(self, tm: TaskManager) -> Callable[[], None]:
+		next_id, tasks, source = tm.next_id, tm.copy_stored(), tm.source
+		self._snapshot()
+		return lambda: self._write(lambda: write_atomic(self.path, encode_binary(next_id, binary_rows(tasks(), source))))
+
+class SqliteStore(Store):
+	# every mutation runs as a single row statement in the open transaction, saving commits it
+	# task event -> column and the Task attribute holding its stored value
+	COLUMNS = {"title": ("title", "title"), "description": ("description", "description"), "checked": ("checked", "checked"), "deleted": ("deleted", "deleted"), "updated_at": ("updated_at", "updated")}
+
+	def __init__(self, path: str, columnar: bool=False) -> None:
+		super().__init__()
+		self.path = path
+		self.columnar = columnar
+		self.lock = threading.Lock()
+		self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+		self.db.execute("PRAGMA journal_mode=WAL")
+		self.db.execute("PRAGMA synchronous=NORMAL")
+		self.db.executescript("""
+			CREATE TABLE IF NOT EXISTS tasks (
+				id INTEGER PRIMARY KEY,
+				position REAL NOT NULL,
+				title TEXT NOT NULL,
+				description TEXT NOT NULL,
+				checked INTEGER NOT NULL,
+				deleted INTEGER NOT NULL,
+				created_at INTEGER NOT NULL,
+				updated_at INTEGER NOT NULL
+			);
+			CREATE INDEX IF NOT EXISTS tasks_position ON tasks(position);
+			CREATE INDEX IF NOT EXISTS tasks_deleted ON tasks(deleted, position);
+			CREATE INDEX IF NOT EXISTS tasks_checked ON tasks(checked, deleted, position);
+			CREATE INDEX IF NOT EXISTS tasks_updated_at ON tasks(updated_at);
+			CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+		""")
+		self.tm: TaskManager | None = None
+		# generation of the last statement run for a task event, a batch runs several under the same one
+		self.published = -1
+
+	def load(self, tm: TaskManager) -> None:
+		# sqlite locks on its own, there is no lock file to take
+		self.read(tm)
+		self.tm = tm
+		self.attach(tm, follow=True)
+
+	def read(self, tm: TaskManager) -> None:
+		with self.lock:
+			rows = self.db.execute("SELECT id, title, description, checked, deleted, created_at, updated_at FROM tasks ORDER BY position").fetchall()
+		tasks = [{"id": row[0], "title": row[1], "description": row[2], "checked": bool(row[3]), "deleted": bool(row[4]), "created_at": row[5], "updated_at": row[6]} for row in rows]
+		tm.load_serialized_tasks({"next_id": self._meta("next_id", 0), "tasks": tasks}, self.columnar)
+
+	def _meta(self, key: str, default):
+		row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+		return default if row is None else row[0]
+
+	def _execute(self, sql: str, params: tuple=()) -> sqlite3.Cursor:
+		with self.lock:
+			if not self.db.in_transaction: self.db.execute("BEGIN")
+			return self.db.execute(sql, params)
+
+	def record(self, event: str, task: Task | None, old) -> None:
+		self.published = self.tm.generation
+		if task is None:
+			self._renumber()
+		elif event == "add":
+			self._execute(
+				"INSERT INTO tasks VALUES (?, (SELECT COALESCE(MAX(position), 0) + 1 FROM tasks), ?, ?, ?, ?, ?, ?)",
+				(task.id, task.title, task.description, task.checked, task.deleted, task.created, task.updated),
+			)
+		elif event == "burn":
+			self._execute("DELETE FROM tasks WHERE id = ?", (task.id,))
+		elif event == "move":
+			self._move(task, old)
+		elif event in self.COLUMNS:
+			column, attribute = self.COLUMNS[event]
+			self._execute(f"UPDATE tasks SET {column} = ? WHERE id = ?", (getattr(task, attribute), task.id))
+
+	def _position(self, task: Task) -> float:
+		return self._execute("SELECT position FROM tasks WHERE id = ?", (task.id,)).fetchone()[0]
+
+	def _move(self, task: Task, old: int) -> None:
+		# the active tasks between both positions rotated through their slots while deleted tasks in between stayed put,
+		# so each of them takes over the stored position of the task whose slot it got, deleted rows keep theirs
+		tm = task._manager
+		start, end = sorted((old, tm.position(task)))
+		tasks = [tm.at(pos) for pos in range(start, end + 1)]
+		positions = sorted(self._position(task) for task in tasks)
+		with self.lock:
+			if not self.db.in_transaction: self.db.execute("BEGIN")
+			self.db.executemany("UPDATE tasks SET position = ? WHERE id = ?", [(position, task.id) for position, task in zip(positions, tasks)])
+
+	def _renumber(self) -> None:
+		# writes the order of the whole list again, only needed after the order was replaced
+		rows = [(position, task.id) for position, task in enumerate(self.tm.all_tasks)]
+		with self.lock:
+			if not self.db.in_transaction: self.db.execute("BEGIN")
+			self.db.executemany("UPDATE tasks SET position = ? WHERE id = ?", rows)
+
+	def prepare(self, tm: TaskManager) -> Callable[[], None]:
+		self._execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (tm.next_id,))
+		generation = tm.generation
+		return lambda: self.commit(generation)
+
+	def commit(self, generation: int | None=None) -> None:
+		# the worker thread may run this while the ui thread is in the middle of publishing a later batch,
+		# its statements are part of the open transaction, so it is left to the save prepared after that batch
+		with self.lock:
+			if generation is not None and generation != self.published: return
+			if self.db.in_transaction: self.db.execute("COMMIT")
+
+	def close(self) -> None:
+		self.commit()
+		self.db.close()
+
+	def query(self, deleted: bool | None=None, checked: bool | None=None, offset: int=0, limit: int | None=None) -> list[int]:
+		where, params = [], []
+		if deleted is not None:
+			where.append("deleted = ?")
+			params.append(deleted)
+		if checked is not None:
+			where.append("checked = ?")
+			params.append(checked)
+		sql = "SELECT id FROM tasks" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY position LIMIT ? OFFSET ?"
+		with self.lock:
+			return [row[0] for row in self.db.execute(sql, (*params, -1 if limit is None else limit, offset))]
+
+def migrate_json(json_path: str, db_path: str) -> int:
+	# one shot copy of a tasks.json into a new sqlite database, returns the number of tasks
+	tm = TaskManager()
+	JsonFile(json_path).read(tm)
+	store = SqliteStore(db_path)
+	with store.lock:
+		store.db.execute("BEGIN")
+		store.db.execute("DELETE FROM tasks")
+		store.db.executemany(
+			"INSERT INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+			[(task.id, position, task.title, task.description, task.checked, task.deleted, task.created, task.updated) for position, task in enumerate(tm.all_tasks)],
+		)
+		store.db.execute("INSERT OR REPLACE INTO meta VALUES ('next_id', ?)", (tm.next_id,))
+		store.db.execute("COMMIT")
+	store.db.close()
+	return len(tm.all_tasks)
+
+def saved_modes(save_path: str) -> list[str]:
+	# the save modes that left their files next to save_path, a plain json file leaves none
+	suffixes = {"journal": ".journal", "sqlite": ".db", "binary": BinaryTasks.SUFFIX}
+	return [mode for mode, suffix in suffixes.items() if os.path.exists(os.path.splitext(save_path)[0] + suffix)]
+
+def resolve_mode(save_path: str, mode: str | None) -> str:
+	# the mode to open save_path in, a mode the list was not saved in would hide its tasks or lose the edits
+	modes = saved_modes(save_path)
+	if mode is None:
+		if len(modes) > 1: raise ValueError(f"{save_path} was saved in the {' and '.join(modes)} modes, pick one with --mode")
+		return modes[0] if modes else "file"
+	if modes and mode not in modes: raise ValueError(f"{save_path} was saved in {modes[0]} mode, not {mode}")
+	return mode
+
+def open_store(save_path: str, mode: str="file", compact_after: int=1000, lazy: bool=False, columnar: bool=False) -> Store:
+	# backend for a save_mode setting, sqlite keeps its database next to the json file
+	if mode == "journal": return Journal(save_path, compact_after, lazy, columnar)
+	if mode == "binary":
+		bin_path = os.path.splitext(save_path)[0] + BinaryTasks.SUFFIX
+		if not os.path.exists(bin_path) and os.path.exists(save_path):
+			tm = TaskManager()
+			JsonFile(save_path).read(tm)
+			export_tasks(tm, bin_path)
+		return BinaryFile(bin_path)
+	if mode == "sqlite":
+		db_path = os.path.splitext(save_path)[0] + ".db"
+		if not os.path.exists(db_path) and os.path.exists(save_path): migrate_json(save_path, db_path)
+		return SqliteStore(db_path, columnar)
+	return JsonFile(save_path, lazy, columnar)
+
+class Autosaver:
+	# debounced saves, the snapshot is taken on the caller's thread and written on a worker thread
+	def __init__(self, store: Store, delay: float=2.0, max_delay: float=10.0) -> None:
+		self.store = store
+		self.delay = delay
+		self.max_delay = max_delay
+		self.latencies: deque[float] = deque(maxlen=100)
+		self.writes = 0
+		self.error: Exception | None = None
+		self._failed = False
+		self._queue: Queue[Callable[[], None] | None] = Queue()
+		self._lock = threading.Lock()
+		self._seen = -1
+		self._last_edit = 0.0
+		self._first_edit: float | None = None
+		threading.Thread(target=self._work, daemon=True).start()
+
+	@property
+	def queue_depth(self) -> int: return self._queue.qsize()
+	@property
+	def last_latency(self) -> float: return self.latencies[-1] if self.latencies else 0.0
+
+	def tick(self, tm: TaskManager) -> None:
+		# call from the ui thread after each key and while idle, never blocks on disk
+		now = time.monotonic()
+		self._recover(tm)
+		if not tm.has_unsaved_changes:
+			self._first_edit = None
+			return
+		if tm.generation != self._seen:
+			if self._first_edit is None: self._first_edit = now
+			self._seen = tm.generation
+			self._last_edit = now
+		# waits for a pause in editing, but never longer than max_delay after the first unsaved edit
+		if now - self._last_edit >= self.delay or now - self._first_edit >= self.max_delay:
+			job = self.store.prepare(tm)
+			tm.mark_saved()
+			self._first_edit = None
+			if job is not None: self._queue.put(job)
+
+	def flush(self) -> None:
+		# waits until every queued write reached the disk
+		self._queue.join()
+
+	def settle(self, tm: TaskManager) -> None:
+		# flush() and hand a failed write back to the store, before the store reads or merges
+		self.flush()
+		self._recover(tm)
+
+	def close(self) -> None:
+		# writes what is queued and ends the worker thread
+		self.flush()
+		self._queue.put(None)
+
+	def _recover(self, tm: TaskManager) -> None:
+		if not self._failed: return
+		# the snapshot that failed to write was already marked as saved, take a full one next time
+		self._failed = False
+		tm.saved_generation = -1
+		self.store.failed()
+
+	def _work(self) -> None:
+		while True:
+			job = self._queue.get()
+			if job is None: return
+			start = time.perf_counter()
+			try:
+				with self._lock: job()
+				self.writes += 1
+				self.error = None
+			except Exception as e:
+				self.error = e
+				self._failed = True
+			self.latencies.append(time.perf_counter() - start)
+			self._queue.task_done()
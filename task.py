@@ -1,9 +1,32 @@
+import json
+import time
+from array import array
+from contextlib import contextmanager
 from datetime import datetime
+from operator import add
+from typing import Callable, Iterator, Protocol
 
-def curr_time() -> str:
-	return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+from search import SearchIndex
+from views import SORT_KEYS, VIEWS, Pager, SortedIndex, step_window
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def curr_time() -> int:
+	# epoch milliseconds, formatted only when shown
+	return time.time_ns() // 1_000_000
+
+def format_time(ms: int) -> str:
+	return datetime.fromtimestamp(ms / 1000).strftime(TIME_FORMAT)
+
+def parse_time(value: int | str) -> int:
+	# older save files store the formatted local time
+	if isinstance(value, int): return value
+	return int(datetime.fromisoformat(value).timestamp() * 1000)
 
 class Task:
+	# no per instance __dict__, a million tasks are a million of these
+	__slots__ = ("_title", "_description", "_checked", "_created_at", "_updated_at", "_deleted", "id", "generation", "_manager", "_slot")
+
 	def __init__(self, title: str, checked: bool=False, description: str="", _id: int=0) -> None:
 		self._title = title
 		self._description = description
@@ -12,7 +35,9 @@ class Task:
 		self._updated_at = curr_time()
 		self._deleted = False
 		self.id = _id
-		self.index = 0
+		self.generation = 0
+		self._manager: "TaskManager | None" = None
+		self._slot = -1
 
 	@property
 	def mark(self) -> str: return "✓" if self.checked else "✕"
@@ -23,11 +48,17 @@ class Task:
 	@property
 	def checked(self) -> bool: return self._checked
 	@property
-	def created_at(self) -> str: return self._created_at
+	def created_at(self) -> str: return format_time(self._created_at)
+	@property
+	def updated_at(self) -> str: return format_time(self._updated_at)
+	@property
+	def created(self) -> int: return self._created_at
 	@property
-	def updated_at(self) -> str: return self._updated_at
+	def updated(self) -> int: return self._updated_at
 	@property
 	def deleted(self) -> bool: return self._deleted
+	@property
+	def index(self) -> int: return self._manager.index_of(self) if self._manager is not None else 0
 
 	# Aliases
 	@property
@@ -44,55 +75,57 @@ class Task:
 	@mark.setter
 	def mark(self, mark: str) -> None: self.checked = (mark == "✓")
 	@title.setter
-	def title(self, title: str) -> None: self._title = title
+	def title(self, title: str) -> None:
+		old, self._title = self._title, title
+		self._changed("title", old)
 	@checked.setter
-	def checked(self, checked: bool) -> None: self._checked = checked
+	def checked(self, checked: bool) -> None:
+		old, self._checked = self._checked, checked
+		self._changed("checked", old)
 	@description.setter
-	def description(self, description: str) -> None: self._description = description
+	def description(self, description: str) -> None:
+		old, self._description = self._description, description
+		self._changed("description", old)
+
+	def _changed(self, event: str, old) -> None:
+		if self._manager is not None: self._manager._changed(self, event, old)
 
 	def set_description(self, description: str):
 		self.description = description
-		self._updated_at = curr_time()
-		return self
+		return self.update()
 	def set_title(self, title: str) -> "Task":
 		self.title = title
-		self._updated_at = curr_time()
-		return self
+		return self.update()
 	def set_checked(self, checked: bool) -> "Task":
 		self.checked = checked
-		self._updated_at = curr_time()
-		return self
+		return self.update()
 	def toggle(self) -> "Task":
 		self.checked = not self.checked
-		self._updated_at = curr_time()
-		return self
+		return self.update()
 	def delete(self) -> "Task":
-		self._deleted = True
-		self._updated_at = curr_time()
-		return self
+		old, self._deleted = self._deleted, True
+		self._changed("deleted", old)
+		return self.update()
 	def restore(self) -> "Task":
-		self._deleted = False
-		self._updated_at = curr_time()
-		return self
+		old, self._deleted = self._deleted, False
+		self._changed("deleted", old)
+		return self.update()
 	def check(self) -> "Task":
 		self.checked = True
-		self._updated_at = curr_time()
-		return self
+		return self.update()
 	def uncheck(self) -> "Task":
 		self.checked = False
-		self._updated_at = curr_time()
-		return self
+		return self.update()
 	def update(self) -> "Task":
-		self._updated_at = curr_time()
+		old, self._updated_at = self._updated_at, curr_time()
+		self._changed("updated_at", old)
 		return self
 	def complete(self) -> "Task":
 		self.checked = True
-		self._updated_at = curr_time()
-		return self
+		return self.update()
 	def uncomplete(self) -> "Task":
 		self.checked = False
-		self._updated_at = curr_time()
-		return self
+		return self.update()
 
 	def __len__(self) -> int:
 		return len(self.title)
@@ -101,9 +134,147 @@ class Task:
 	def __repr__(self) -> str:
 		return str(self)
 
+class TaskSource(Protocol):
+	# tasks that stay encoded until TaskManager needs them, see storage.LazyTasks
+	ids: array
+	deleted: bytearray
+	def __len__(self) -> int: ...
+	def load(self, idx: int) -> Task: ...
+	def raw(self, idx: int) -> bytes: ...
+
+class TaskColumns:
+	# parsed tasks as parallel arrays, a Task object is only made for the tasks that get shown or edited
+	def __init__(self, tasks: list[dict]) -> None:
+		strings: dict[str, str] = {}
+		self.ids = array("q", (task["id"] for task in tasks))
+		self.deleted = bytearray(bool(task["deleted"]) for task in tasks)
+		self.checked = bytearray(bool(task["checked"]) for task in tasks)
+		self.created = array("q", (parse_time(task["created_at"]) for task in tasks))
+		self.updated = array("q", (parse_time(task["updated_at"]) for task in tasks))
+		# equal titles and descriptions share one string
+		self.titles = [strings.setdefault(task["title"], task["title"]) for task in tasks]
+		self.descriptions = [strings.setdefault(task["description"], task["description"]) for task in tasks]
+
+	def __len__(self) -> int: return len(self.ids)
+
+	def load(self, idx: int) -> Task:
+		task = Task(self.titles[idx], bool(self.checked[idx]), self.descriptions[idx], self.ids[idx])
+		task._created_at, task._updated_at, task._deleted = self.created[idx], self.updated[idx], bool(self.deleted[idx])
+		return task
+
+	def raw(self, idx: int) -> bytes:
+		return json.dumps({
+			"title": self.titles[idx],
+			"description": self.descriptions[idx],
+			"checked": bool(self.checked[idx]),
+			"created_at": self.created[idx],
+			"updated_at": self.updated[idx],
+			"deleted": bool(self.deleted[idx]),
+			"id": self.ids[idx],
+		}).encode()
+
+class TaskStore(Protocol):
+	# storage backend that may answer filters itself, see storage.Store
+	def query(self, deleted: bool | None=None, checked: bool | None=None, offset: int=0, limit: int | None=None) -> list[int] | None: ...
+
+class TaskHistory(Protocol):
+	# sees every event before batching, see history.History
+	def record(self, event: str, task: Task | None, old) -> None: ...
+	def checkpoint(self) -> None: ...
+	def discard(self) -> None: ...
+
+class _Fenwick:
+	# Binary indexed tree over 0/1 slot flags, gives O(log n) rank and select
+	def __init__(self, bits: list[int] | None=None) -> None:
+		# built a level at a time, level k sums aligned blocks of 2**k flags and the even blocks are the tree nodes with lowbit 2**k
+		level = array("q")
+		level.extend(bits or [])
+		self._tree = array("q", bytes(8 * (len(level) + 1)))
+		self.total = sum(level)
+		step = 1
+		while level:
+			self._tree[step::2 * step] = level[::2]
+			level = array("q", map(add, level[::2], level[1::2]))
+			step *= 2
+
+	def __len__(self) -> int: return len(self._tree) - 1
+
+	def append(self, bit: int) -> None:
+		i = len(self._tree)
+		self._tree.append(bit + self.prefix(i - 1) - self.prefix(i - (i & -i)))
+		self.total += bit
+	def add(self, slot: int, delta: int) -> None:
+		i, size = slot + 1, len(self._tree)
+		while i < size:
+			self._tree[i] += delta
+			i += i & -i
+		self.total += delta
+	def prefix(self, slot: int) -> int:
+		# number of set flags before slot
+		total = 0
+		while slot > 0:
+			total += self._tree[slot]
+			slot &= slot - 1
+		return total
+	def select(self, k: int, other: "_Fenwick | None"=None) -> int:
+		# slot of the k-th set flag (summed with other when given)
+		pos, size = 0, len(self._tree) - 1
+		step = 1 << size.bit_length()
+		while step:
+			nxt = pos + step
+			if nxt <= size:
+				value = self._tree[nxt] + (other._tree[nxt] if other is not None else 0)
+				if value <= k:
+					pos = nxt
+					k -= value
+			step >>= 1
+		return pos
+
+_EMPTY, _ACTIVE, _DELETED = 0, 1, 2
+_STATE_FROM_DELETED = bytes([_ACTIVE, _DELETED]) + bytes(254)
+_ACTIVE_FROM_STATE = bytes([0, 1, 0]) + bytes(253)
+_DELETED_FROM_STATE = bytes([0, 0, 1]) + bytes(253)
+# groups of the open and checked views, only active tasks belong to one
+_NO_GROUP, _OPEN, _CHECKED = 0, 1, 2
+_OPEN_FROM_GROUP = bytes([0, 1, 0]) + bytes(253)
+_CHECKED_FROM_GROUP = bytes([0, 0, 1]) + bytes(253)
+
 class TaskManager:
 	def __init__(self) -> None:
-		self._tasks = []
+		self._slots: list[Task | None] = []
+		self._state = bytearray()
+		self._active = _Fenwick()
+		self._deleted = _Fenwick()
+		self._burned = 0
+		self._ids: dict[int, Task] = {}
+		self._next_id = 0
+		# lazily loaded lists keep undecoded tasks as None slots pointing into the source
+		self._source: TaskSource | None = None
+		self._raw = array("q")
+		self._source_ids: dict[int, int] | None = None
+		self.store: TaskStore | None = None
+		self.history: TaskHistory | None = None
+		# bumped whenever the slots are renumbered, a burned task of an older layout lost its slot
+		self.layout = 0
+		self._search: SearchIndex | None = None
+		# indexes of the other views, built when a view is first shown and then kept up to date
+		self.view_name = "list"
+		self._groups: bytearray | None = None
+		self._open = _Fenwick()
+		self._checked = _Fenwick()
+		self._sorted: dict[str, SortedIndex] = {}
+		self._view: list[Task] | None = None
+		self._view_at = (0, 0)
+		# the trash scrolls on its own, in trash order
+		self.trash = Pager(lambda: self._deleted.total)
+		# how often the viewport was selected again from scratch, shown by :stats
+		self.viewport_builds = 0
+		self._listeners: list[Callable[[str, Task | None, object], None]] = []
+		self.generation = 0
+		self.saved_generation = 0
+		self._dirty: dict[int, Task] = {}
+		# events of the open batch(), published together on commit
+		self._batch: list[tuple[str, Task | None, object]] | None = None
 		self._selected = 0
 		self.scroll_y = 0
 		self.max_items = 27
@@ -111,146 +282,692 @@ class TaskManager:
 	@property
 	def selected(self) -> int: return self._selected
 	@property
-	def deleted_tasks(self) -> list[Task]: return [task for task in self._tasks if task.deleted]
+	def deleted_tasks(self) -> list[Task]: return [self._task(self._deleted.select(k)) for k in range(self._deleted.total)]
+	@property
+	def all_tasks(self) -> list[Task]: return [self._task(slot) for slot, state in enumerate(self._state) if state != _EMPTY]
+	@property
+	def active_tasks(self) -> list[Task]: return [self._task(slot) for slot, state in enumerate(self._state) if state == _ACTIVE]
 	@property
-	def all_tasks(self) -> list[Task]: return self._tasks
+	def tasks(self) -> list[Task]: return list(self._viewport())
 	@property
-	def active_tasks(self) -> list[Task]: return [task for task in self._tasks if not task.deleted]
+	def active_count(self) -> int: return self._active.total
 	@property
-	def tasks(self) -> list[Task]: return self.active_tasks[self.scroll_y:self.scroll_y+self.max_items]
+	def deleted_count(self) -> int: return self._deleted.total
+	@property
+	def checked_count(self) -> int: return self._filters()[1].total
+	@property
+	def has_unsaved_changes(self) -> bool: return self.generation != self.saved_generation
+	@property
+	def next_id(self) -> int: return self._next_id
+	@property
+	def source(self) -> TaskSource | None: return self._source
 
 	@selected.setter
 	def selected(self, idx: int) -> None:
 		self._selected = idx
-		self._index_tasks()
 
 	@tasks.setter
 	def tasks(self, tasks: list[Task]) -> None:
-		self.active_tasks[self.scroll_y:self.scroll_y+self.max_items] = tasks
-		self._index_tasks()
+		active = self.active_tasks
+		active[self.scroll_y:self.scroll_y+self.max_items] = tasks
+		self.active_tasks = active
 
 	@active_tasks.setter
 	def active_tasks(self, tasks: list[Task]) -> None:
-		tasks.extend(self.deleted_tasks)
-		self._tasks = tasks
-		self._index_tasks()
+		old = self.all_tasks
+		# a rollback has to put burned slots back where they were, so the batch keeps the whole layout
+		if self._batch is not None: self._batch.append(("layout", None, (self._slots, self._state, self._raw, self._source, self._burned)))
+		self._rebuild(tasks + self.deleted_tasks)
+		self._changed(None, "reorder", old)
 
-	def __len__(self) -> int: return len(self.tasks)
+	def __len__(self) -> int: return self._visible()
 
-	def add(self, title: str, description: str="", checked: bool=False) -> None:
-		self._add(Task(title, checked, description, len(self.tasks)))
+	def add(self, title: str, description: str="", checked: bool=False) -> Task:
+		task = Task(title, checked, description, self._allocate_id())
+		self._add(task)
+		return task
 	def remove(self, idx: int) -> None:
 		self._remove(idx)
 
 	def _add(self, task: Task) -> None:
-		self._tasks.append(task)
-		self._index_tasks()
+		self._attach(task)
 	def _remove(self, idx: int) -> None:
-		self._tasks.pop(idx)
-		self._index_tasks()
+		self._burn(self._task(self._active.select(idx, self._deleted)))
 
 	def next(self) -> None:
-		if len(self.tasks) == 0: return
-		if self.selected + 1 >= len(self.tasks) and not (self.selected + 1 + self.scroll_y >= len(self.active_tasks)):
-			excess = ((self.selected + 1) - len(self.tasks)) + 1
+		visible = self._visible()
+		if visible == 0: return
+		if self.selected + 1 >= visible and not (self.selected + 1 + self.scroll_y >= self._count()):
+			excess = ((self.selected + 1) - visible) + 1
 			self.scroll_y += excess
-		elif self.selected + 1 + self.scroll_y >= len(self.active_tasks):
+		elif self.selected + 1 + self.scroll_y >= self._count():
 			self.scroll_y = 0
 			self.selected = 0
 		else:
-			self.selected = (self.selected + 1) % len(self.tasks)
-		self._index_tasks()
+			self.selected = (self.selected + 1) % visible
 	def prev(self) -> None:
-		if len(self.tasks) == 0: return
+		if self._visible() == 0: return
 		if self.selected - 1 < 0:
 			if self.scroll_y > 0:
 				self.scroll_y -= 1
 			else:
-				if len(self.active_tasks) > self.max_items:
-					self.scroll_y = len(self.active_tasks) - self.max_items
+				if self._count() > self.max_items:
+					self.scroll_y = self._count() - self.max_items
 				else:
 					self.scroll_y = 0
-				self.selected = len(self.tasks) - 1
+				self.selected = self._visible() - 1
 		else:
-			self.selected = (self.selected - 1) % len(self.tasks)
-		self._index_tasks()
+			self.selected = (self.selected - 1) % self._visible()
+
+	def step(self, count: int) -> None:
+		# count times next(), or -count times prev(), with a single scroll
+		if count == 0 or self._visible() == 0: return
+		self.scroll_y, self.selected = step_window(self.scroll_y, self.selected, count, self._count(), self.max_items)
 
 	def move_task(self, idx: int, new_idx: int) -> None:
-		if new_idx < 0 or new_idx >= len(self.tasks): return
-		self._tasks.insert(new_idx + self.scroll_y, self._tasks.pop(idx + self.scroll_y))
+		# the other views are ordered by the tasks themselves, only the list order can be changed
+		if self.view_name != "list": return
+		visible = self._visible()
+		if new_idx < 0 or new_idx >= visible or idx < 0 or idx >= visible: return
+		self._move(idx + self.scroll_y, new_idx + self.scroll_y)
 		self.selected = new_idx
-		self.active_tasks[new_idx].update()
-		self._index_tasks()
+		self._viewport()[new_idx].update()
 
-	def load_serialized_tasks(self, tasks: list[dict]) -> None:
-		self._tasks = [deserialize_task(task) for task in tasks]
-		self._index_tasks()
+	def load_serialized_tasks(self, tasks: list[dict] | dict, columnar: bool=False) -> None:
+		# accepts both the bare task list of older save files and the serialize() document
+		if isinstance(tasks, dict):
+			next_id = tasks.get("next_id", 0)
+			tasks = tasks["tasks"]
+		else:
+			next_id = 0
+		if columnar:
+			columns = TaskColumns(tasks)
+			if unique_ids(columns.ids):
+				self.load_source(columns, max(next_id, max(columns.ids, default=-1) + 1))
+				return
+		self._next_id = next_id
+		self._rebuild([deserialize_task(task) for task in tasks])
+	def load_source(self, source: TaskSource, next_id: int) -> None:
+		# takes over a lazily decoded task list, only the tasks that get shown or edited become Task objects
+		self._rebuild([])
+		self._source = source
+		self._next_id = next_id
+		self._slots = [None] * len(source)
+		self._raw = array("q", range(len(source)))
+		self._state = source.deleted.translate(_STATE_FROM_DELETED)
+		self._deleted = _Fenwick(source.deleted)
+		self._active = _Fenwick(self._state.translate(_ACTIVE_FROM_STATE))
+	def load_serialized_task(self, data: dict) -> Task:
+		# inserts the task or overwrites the stored one with the same id
+		task = self._lookup(data["id"])
+		if task is None:
+			task = deserialize_task(data)
+			self._add(task)
+			return task
+		task.title, task.description, task.checked = data["title"], data["description"], data["checked"]
+		if task.deleted != data["deleted"]:
+			task._deleted = data["deleted"]
+			task._changed("deleted", not task._deleted)
+		task._created_at, updated = parse_time(data["created_at"]), parse_time(data["updated_at"])
+		if task._updated_at != updated:
+			old, task._updated_at = task._updated_at, updated
+			task._changed("updated_at", old)
+		return task
 	def serialize_tasks(self) -> list[dict]:
-		return [serialize_task(task) for task in self._tasks]
+		return [serialize_task(task) for task in self.all_tasks]
+	def serialize(self) -> dict:
+		return {"next_id": self._next_id, "tasks": self.serialize_tasks()}
+	def raw_tasks(self) -> list[dict | bytes]:
+		# like serialize_tasks, but tasks that were never decoded stay as their source bytes
+		return [serialize_task(task) if task is not None else self._source.raw(self._raw[slot]) for slot, task in enumerate(self._slots) if self._state[slot] != _EMPTY]
+
+	def copy_stored(self) -> Callable[[], Iterator[Task | int]]:
+		# stored() in two parts, a copy of the slot arrays taken now at C speed and the walk over it, which a writer thread runs later
+		# a task edited while the walk runs is written as it is by then, the edit is part of the next save anyway
+		slots, state, raw = list(self._slots), bytes(self._state), array("q", self._raw)
+		return lambda: (task if task is not None else raw[slot] for slot, task in enumerate(slots) if state[slot] != _EMPTY)
+
+	def stored(self) -> Iterator[Task | int]:
+		# every stored task in list order, the index into source for tasks that were not decoded
+		for slot, task in enumerate(self._slots):
+			if self._state[slot] != _EMPTY: yield task if task is not None else self._raw[slot]
 
 	def _bulk_add(self, tasks: list[Task]) -> None:
-		for task in tasks: self._add(task)
+		with self.batch():
+			for task in tasks: self._add(task)
 		self.selected = len(self.tasks) - 1
-		self._index_tasks()
 	def _bulk_remove(self, taskidxs: list[int]) -> None:
-		for task in taskidxs: self._remove(task)
-		self._index_tasks()
+		# resolved before the first burn, removing shifts the indexes of everything after it
+		tasks = [self._task(self._active.select(idx, self._deleted)) for idx in taskidxs]
+		with self.batch():
+			for task in tasks:
+				if task._manager is self: self._burn(task)
+
+	@contextmanager
+	def batch(self) -> Iterator["TaskManager"]:
+		# mutations inside become one generation with one dirty set, an exception undoes all of them
+		if self._batch is not None:
+			yield self
+			return
+		if self.history is not None: self.history.checkpoint()
+		self._batch, next_id = [], self._next_id
+		try:
+			yield self
+		except BaseException:
+			events, self._batch = self._batch, []
+			try: self._rollback(events)
+			finally: self._batch = None
+			self._next_id = next_id
+			if self.history is not None: self.history.discard()
+			raise
+		events, self._batch = [event for event in self._batch if event[0] != "layout"], None
+		# a batch is undone as a whole
+		if self.history is not None: self.history.checkpoint()
+		if not events: return
+		self.generation += 1
+		for event, task, old in events:
+			if task is not None:
+				task.generation = self.generation
+				self._dirty[task.id] = task
+		if len(events) > 1 and any(event == "move" for event, task, old in events):
+			# listeners read the position of a moved task when they are called, after the whole batch
+			events = [(event, task, old) for event, task, old in events if event != "move"] + [("reorder", None, None)]
+		for event, task, old in events:
+			for listener in self._listeners: listener(event, task, old)
+		if self._burned > 64 and self._burned * 2 > len(self._slots): self._compact()
+
+	def _rollback(self, events: list[tuple[str, Task | None, object]]) -> None:
+		# replays the events backwards, whatever they emit on the way is dropped by the open batch
+		for event, task, old in reversed(events):
+			if event == "layout": self._restore(old)
+			elif task is None: continue
+			elif event == "add": self._burn(task)
+			elif event == "burn": self._unburn(task)
+			elif event == "move": self._move(self.position(task), old)
+			elif event == "deleted":
+				task._deleted = old
+				self._sync_deleted(task)
+			else: setattr(task, f"_{event}", old)
+		# derived indexes missed the silent field resets, they are built again when needed
+		self._search = None
+		self._groups = None
+		self._sorted = {}
+		self._view = None
+		self._clamp_scroll()
 
 	def select_task(self, idx: int) -> None:
 		self.selected = idx
 		if idx == -1:
-			if len(self.active_tasks) > self.max_items:
-				self.scroll_y = len(self.active_tasks) - self.max_items
+			if self._count() > self.max_items:
+				self.scroll_y = self._count() - self.max_items
 			else:
 				self.scroll_y = 0
-			self.selected = len(self.tasks) - 1
-		self._index_tasks()
+			self.selected = self._visible() - 1
 
 	def delete_current_task(self) -> None:
-		# Moves the task to the bottom
-		self.move_task(self.current_task.index, len(self.tasks) - 1)
-		self.get(len(self.tasks) - 1).delete()
-		self._index_tasks()
+		self.delete_task(self.current_task.index)
 
 	def delete_task(self, idx: int) -> None:
 		# Moves the task to the bottom
-		self.move_task(idx, len(self.tasks) - 1)
-		self.get(len(self.tasks) - 1).delete()
-		self._index_tasks()
+		last = self._visible() - 1
+		if last < 0: return
+		if self.view_name != "list":
+			self._viewport()[idx].delete()
+			return
+		self.move_task(idx, last)
+		self._viewport()[last].delete()
+
+	def get(self, task_id: int) -> Task | None:
+		return self._lookup(task_id)
+	def search(self, text: str) -> list[Task]:
+		# active tasks containing every word of text in list order
+		matches = (self._lookup(task_id) for task_id in self._search_index().query(text))
+		return sorted((task for task in matches if not task.deleted), key=self.position)
+
+	def matching(self, deleted: bool | None=None, checked: bool | None=None, words: str="") -> list[Task]:
+		# the tasks a query has to look at in list order, narrowed by the word index or the flag trees
+		if not words: return self.filter(deleted, checked)
+		matches = (self._lookup(task_id) for task_id in self._search_index().query(words))
+		return sorted((task for task in matches if (deleted is None or task.deleted == deleted) and (checked is None or task.checked == checked)), key=lambda task: task._slot)
 
-	def get(self, idx: int) -> Task:
-		if len(self.tasks) == 0: return Task("No tasks found", False, "No tasks found")
-		if idx >= len(self.tasks): return self.current_task
-		return self.tasks[idx]
+	def _search_index(self) -> SearchIndex:
+		# built on the first search, then kept up to date by _changed
+		if self._search is None:
+			self._search = SearchIndex()
+			for task in self.all_tasks: self._search.index(task.id, f"{task.title} {task.description}")
+		return self._search
+
+	def reveal(self, task: Task) -> bool:
+		# selects a task of the current view, scrolling only when it is outside the viewport
+		pos = self._rank(task)
+		if pos is None: return False
+		if not self.scroll_y <= pos < self.scroll_y + self.max_items:
+			self.scroll_y = max(0, min(pos, self._count() - self.max_items))
+		self.selected = pos - self.scroll_y
+		return True
+
+	def set_view(self, name: str) -> None:
+		# switches the order tasks are shown and scrolled in, keeping the current task selected
+		if name not in VIEWS: raise ValueError(f"unknown view '{name}'")
+		current = self.current_task if self._visible() else None
+		self.view_name = name
+		self._view = None
+		self.scroll_y = self.selected = 0
+		if current is not None: self.reveal(current)
+
+	def trash_tasks(self) -> list[Task]:
+		# the deleted tasks in the trash window, selected through the deleted tree without walking the trash
+		self.trash.clamp()
+		end = min(self._deleted.total, self.trash.scroll_y + self.trash.rows)
+		return [self._task(self._deleted.select(pos)) for pos in range(self.trash.scroll_y, end)]
+	@property
+	def trash_task(self) -> Task | None:
+		self.trash.clamp()
+		if self._deleted.total == 0: return None
+		return self._task(self._deleted.select(self.trash.position))
+
+	def at(self, pos: int) -> Task:
+		# the active task at a list position
+		return self._task(self._active.select(pos))
+
+	def filter(self, deleted: bool | None=None, checked: bool | None=None, offset: int=0, limit: int | None=None) -> list[Task]:
+		# tasks matching the flags in list order, answered by the store when it can
+		ids = self.store.query(deleted, checked, offset, limit) if self.store is not None else None
+		if ids is not None: return [self._lookup(task_id) for task_id in ids]
+		tree = None
+		if checked is None and deleted is not None: tree, flags, flag = (self._deleted, self._state, _DELETED) if deleted else (self._active, self._state, _ACTIVE)
+		elif checked is not None and deleted is False: tree, flags, flag = self._filters()[1 if checked else 0], self._groups, _CHECKED if checked else _OPEN
+		if tree is not None:
+			end = tree.total if limit is None else min(tree.total, offset + limit)
+			if end - offset <= len(flags) >> 7: return [self._task(tree.select(pos)) for pos in range(offset, end)]
+			# a long run of results is cheaper to collect with one pass over the flags than with a tree descent each
+			return [self._task(slot) for slot, value in enumerate(flags) if value == flag][offset:end]
+		tasks = [task for task in self.all_tasks if (deleted is None or task.deleted == deleted) and (checked is None or task.checked == checked)]
+		return tasks[offset:None if limit is None else offset + limit]
+
+	def delete(self, task_id: int) -> Task | None:
+		task = self._lookup(task_id)
+		if task is not None and not task.deleted: task.delete()
+		return task
+	def restore(self, task_id: int) -> Task | None:
+		task = self._lookup(task_id)
+		if task is None or not task.deleted: return None
+		return task.restore()
+	def burn(self, task_id: int) -> Task | None:
+		task = self._lookup(task_id)
+		if task is not None: self._burn(task)
+		return task
+	def rekey(self, task: Task) -> Task:
+		# gives the task a new id at the same position, for when another instance used its id for another task
+		pos, rank = self.position(task), self.rank(task)
+		self._burn(task)
+		task.id = self._allocate_id()
+		self._revive(task, pos, self.layout, rank)
+		return task
+	def reserve_ids(self, next_id: int) -> None:
+		# ids below next_id are in use elsewhere
+		self._next_id = max(self._next_id, next_id)
+	def move_to(self, task_id: int, pos: int) -> Task | None:
+		task = self._lookup(task_id)
+		if task is None or task.deleted or not 0 <= pos < self._active.total: return None
+		self._move(self.position(task), pos)
+		return task
+
+	def counts(self) -> dict[str, int]:
+		# the numbers behind each list filter, none of them walks the tasks once the groups are built
+		checked = self.checked_count
+		return {"active": self.active_count, "open": self.active_count - checked, "checked": checked, "deleted": self.deleted_count, "all": self.active_count + self.deleted_count}
+
+	def changed_tasks(self) -> list[Task]:
+		# tasks edited, added or burned since the last mark_saved()
+		return list(self._dirty.values())
+	def mark_saved(self) -> None:
+		self.saved_generation = self.generation
+		self._dirty = {}
+
+	def subscribe(self, listener: Callable[[str, Task | None, object], None]) -> None:
+		# listener(event, task, old) is called after every mutation, event is the changed field or add/burn/move/reorder
+		self._listeners.append(listener)
+	def unsubscribe(self, listener: Callable[[str, Task | None, object], None]) -> None:
+		self._listeners.remove(listener)
 
 	@property
 	def current_task(self) -> Task:
-		if len(self.tasks) == 0: return Task("No tasks found", False, "No tasks found")
-		if self.selected >= len(self.tasks): self.prev()
-		return self.tasks[self.selected]
-
-	def _index_tasks(self) -> None:
-		max_idx = len(self.tasks)
-		for idx, task in enumerate(self.tasks):
-			task.index = idx
-		# index deleted tasks
-		for idx, task in enumerate(self.deleted_tasks):
-			task.index = idx + max_idx
+		if self._visible() == 0: return Task("No tasks found", False, "No tasks found")
+		if self.selected >= self._visible(): self.prev()
+		return self._viewport()[self.selected]
+
+	def position(self, task: Task) -> int:
+		# position within the active list, or within the trash for deleted tasks
+		if self._state[task._slot] == _DELETED: return self._deleted.prefix(task._slot)
+		return self._active.prefix(task._slot)
+
+	def rank(self, task: Task) -> int:
+		# position among all stored tasks, the trash included, also for a task that was just burned
+		return self._active.prefix(task._slot) + self._deleted.prefix(task._slot)
+
+	def index_of(self, task: Task) -> int:
+		# viewport relative for active tasks, deleted tasks are numbered after the viewport
+		if task._manager is not self: return 0
+		if self._state[task._slot] == _DELETED:
+			return self._visible() + self._deleted.prefix(task._slot)
+		pos = self._rank(task)
+		return -1 if pos is None else pos - self.scroll_y
+
+	def _visible(self) -> int:
+		return max(0, min(self.max_items, self._count() - self.scroll_y))
+
+	def _count(self) -> int:
+		# number of tasks in the current view
+		if self.view_name in ("list", "open"): return self._active.total
+		if self.view_name == "checked": return self._filters()[1].total
+		return len(self._sorted_index(self.view_name))
+
+	def _select(self, pos: int) -> Task:
+		# task at a position of the current view
+		if self.view_name == "list": return self._task(self._active.select(pos))
+		if self.view_name in ("open", "checked"):
+			opened, checked = self._filters()
+			if self.view_name == "checked": return self._task(checked.select(pos))
+			if pos < opened.total: return self._task(opened.select(pos))
+			return self._task(checked.select(pos - opened.total))
+		return self._lookup(self._sorted_index(self.view_name).select(pos))
+
+	def _rank(self, task: Task) -> int | None:
+		# position of the task in the current view, None when it is not part of it
+		if task._manager is not self or self._state[task._slot] != _ACTIVE: return None
+		if self.view_name == "list": return self._active.prefix(task._slot)
+		if self.view_name in ("open", "checked"):
+			opened, checked = self._filters()
+			if self._groups[task._slot] == _OPEN: return opened.prefix(task._slot) if self.view_name == "open" else None
+			return checked.prefix(task._slot) + (opened.total if self.view_name == "open" else 0)
+		return self._sorted_index(self.view_name).rank(task.id)
+
+	def _filters(self) -> tuple[_Fenwick, _Fenwick]:
+		if self._groups is None:
+			self._groups = bytearray(self._group(slot) for slot in range(len(self._slots)))
+			self._open = _Fenwick(self._groups.translate(_OPEN_FROM_GROUP))
+			self._checked = _Fenwick(self._groups.translate(_CHECKED_FROM_GROUP))
+		return self._open, self._checked
+
+	def _group(self, slot: int) -> int:
+		if self._state[slot] != _ACTIVE: return _NO_GROUP
+		return _CHECKED if self._task(slot).checked else _OPEN
+
+	def _regroup(self, slot: int) -> bool:
+		old, new = self._groups[slot], self._group(slot)
+		if old == new: return False
+		if old != _NO_GROUP: (self._open if old == _OPEN else self._checked).add(slot, -1)
+		if new != _NO_GROUP: (self._open if new == _OPEN else self._checked).add(slot, 1)
+		self._groups[slot] = new
+		return True
+
+	def _sorted_index(self, name: str) -> SortedIndex:
+		index = self._sorted.get(name)
+		if index is None:
+			key, reverse = SORT_KEYS[name]
+			index = self._sorted[name] = SortedIndex(((key(task), task.id) for task in self.active_tasks), reverse)
+		return index
+
+	def _update_views(self, task: Task | None, event: str, old) -> None:
+		# moves the task within every view index that was built, O(log n) per index
+		changed = set()
+		if task is None:
+			self._groups = None
+			self._sorted = {}
+			changed.add(self.view_name)
+		elif self._groups is not None and event not in ("title", "description", "updated_at"):
+			# only adds, burns, moves and the checked and deleted flags can change a group
+			if event == "add" and task._slot == len(self._groups):
+				self._groups.append(_NO_GROUP)
+				self._open.append(0)
+				self._checked.append(0)
+			if event == "move":
+				start, end = sorted((old, self.position(task)))
+				slots = [self._active.select(pos) for pos in range(start, end + 1)]
+			else:
+				slots = [task._slot]
+			if any([self._regroup(slot) for slot in slots]): changed.update(("open", "checked"))
+		if task is not None and event != "move":
+			active = task._manager is self and self._state[task._slot] == _ACTIVE
+			for name, index in self._sorted.items():
+				if index.insert(task.id, SORT_KEYS[name][0](task)) if active else index.remove(task.id): changed.add(name)
+		if self.view_name in changed:
+			self._view = None
+			self._clamp_scroll()
+
+	def _viewport(self) -> list[Task]:
+		start, visible = max(self.scroll_y, 0), self._visible()
+		if self._view is not None and self._view_at == (start, visible): return self._view
+		view, (old_start, old_visible) = self._view, self._view_at
+		if view is not None and old_visible == visible and 0 < abs(start - old_start) < visible:
+			# scrolled by a few rows, slide the cached window instead of selecting every row again
+			if start > old_start:
+				view = view[start - old_start:] + [self._select(pos) for pos in range(old_start + visible, start + visible)]
+			else:
+				view = [self._select(pos) for pos in range(start, old_start)] + view[:visible - (old_start - start)]
+		else:
+			self.viewport_builds += 1
+			view = [self._select(pos) for pos in range(start, start + visible)]
+		self._view, self._view_at = view, (start, visible)
+		return view
+
+	def _changed(self, task: Task | None, event: str, old) -> None:
+		if self.history is not None: self.history.record(event, task, old)
+		if event == "deleted": self._sync_deleted(task)
+		if task is not None and self._search is not None:
+			if event in ("title", "description", "add"): self._search.index(task.id, f"{task.title} {task.description}")
+			elif event == "burn": self._search.remove(task.id)
+		if self._groups is not None or self._sorted or task is None: self._update_views(task, event, old)
+		if self._batch is not None:
+			self._batch.append((event, task, old))
+			return
+		self.generation += 1
+		if task is not None:
+			task.generation = self.generation
+			self._dirty[task.id] = task
+		for listener in self._listeners: listener(event, task, old)
+
+	def _task(self, slot: int) -> Task:
+		task = self._slots[slot]
+		if task is None:
+			task = self._source.load(self._raw[slot])
+			task._manager = self
+			task._slot = slot
+			self._slots[slot] = task
+			self._ids[task.id] = task
+		return task
+
+	def _lookup(self, task_id: int) -> Task | None:
+		task = self._ids.get(task_id)
+		if task is not None or self._source is None: return task
+		if self._source_ids is None:
+			# built once, on the first lookup of a task that was not decoded yet
+			self._source_ids = {self._source.ids[self._raw[slot]]: slot for slot, task in enumerate(self._slots) if task is None and self._state[slot] != _EMPTY}
+		slot = self._source_ids.get(task_id)
+		if slot is None or self._slots[slot] is not None or self._state[slot] == _EMPTY: return None
+		return self._task(slot)
+
+	def _allocate_id(self) -> int:
+		self._next_id += 1
+		return self._next_id - 1
+
+	def _register(self, task: Task) -> None:
+		# ids are unique for the lifetime of the list, older save files may contain duplicates
+		if task.id in self._ids or task.id < 0: task.id = self._allocate_id()
+		self._ids[task.id] = task
+		if task.id >= self._next_id: self._next_id = task.id + 1
+
+	def _attach(self, task: Task) -> None:
+		self._register(task)
+		task._manager = self
+		task._slot = len(self._slots)
+		self._slots.append(task)
+		if self._source is not None: self._raw.append(-1)
+		self._state.append(_DELETED if task.deleted else _ACTIVE)
+		self._active.append(0 if task.deleted else 1)
+		self._deleted.append(1 if task.deleted else 0)
+		self._view = None
+		self._changed(task, "add", None)
+
+	def _rebuild(self, tasks: list[Task]) -> None:
+		for task in self._slots:
+			if task is not None: task._manager = None
+		self._ids = {}
+		for slot, task in enumerate(tasks):
+			self._register(task)
+			task._manager = self
+			task._slot = slot
+		self._slots = list(tasks)
+		self._state = bytearray(_DELETED if task.deleted else _ACTIVE for task in tasks)
+		self._active = _Fenwick([0 if task.deleted else 1 for task in tasks])
+		self._deleted = _Fenwick([1 if task.deleted else 0 for task in tasks])
+		self._burned = 0
+		self.layout += 1
+		self._source = None
+		self._raw = array("q")
+		self._source_ids = None
+		self._search = None
+		self._groups = None
+		self._sorted = {}
+		self._view = None
+
+	def _compact(self) -> None:
+		# drops burned slots, undecoded tasks keep pointing at their source records
+		keep = [slot for slot, state in enumerate(self._state) if state != _EMPTY]
+		self._slots = [self._slots[slot] for slot in keep]
+		self._state = bytearray(self._state[slot] for slot in keep)
+		if self._source is not None: self._raw = array("q", (self._raw[slot] for slot in keep))
+		for slot, task in enumerate(self._slots):
+			if task is not None: task._slot = slot
+		self._active = _Fenwick(self._state.translate(_ACTIVE_FROM_STATE))
+		self._deleted = _Fenwick(self._state.translate(_DELETED_FROM_STATE))
+		if self._groups is not None:
+			self._groups = bytearray(self._groups[slot] for slot in keep)
+			self._open = _Fenwick(self._groups.translate(_OPEN_FROM_GROUP))
+			self._checked = _Fenwick(self._groups.translate(_CHECKED_FROM_GROUP))
+		self._source_ids = None
+		self._burned = 0
+		self.layout += 1
+		self._view = None
+
+	def _burn(self, task: Task) -> None:
+		slot = task._slot
+		if self._state[slot] == _DELETED: self._deleted.add(slot, -1)
+		else: self._active.add(slot, -1)
+		self._state[slot] = _EMPTY
+		self._slots[slot] = None
+		del self._ids[task.id]
+		task._manager = None
+		self._burned += 1
+		self._view = None
+		self._clamp_scroll()
+		self._changed(task, "burn", None)
+		# drop burned slots once they make up half of the list, amortized O(1) per burn
+		if self._batch is None and self._burned > 64 and self._burned * 2 > len(self._slots): self._compact()
+
+	def _restore(self, layout: tuple) -> None:
+		self._slots, self._state, self._raw, self._source, self._burned = layout
+		self._ids = {}
+		for slot, task in enumerate(self._slots):
+			if task is None: continue
+			task._manager, task._slot = self, slot
+			self._ids[task.id] = task
+		self._active = _Fenwick(self._state.translate(_ACTIVE_FROM_STATE))
+		self._deleted = _Fenwick(self._state.translate(_DELETED_FROM_STATE))
+		self._source_ids = None
+		self.layout += 1
+
+	def _revive(self, task: Task, pos: int, layout: int, rank: int) -> None:
+		# puts a burned task back at pos, into its old slot when the list was not compacted since
+		# a deleted task goes back to its rank among all tasks, which keeps both its trash order and where it is restored to
+		if layout == self.layout and task._slot < len(self._slots) and self._state[task._slot] == _EMPTY and self._slots[task._slot] is None:
+			self._unburn(task)
+			self._changed(task, "add", None)
+			# stores append added tasks, deleted tasks may sit in between, so they write the order again unless it went last
+			if self.rank(task) != self._active.total + self._deleted.total - 1: self._changed(None, "reorder", None)
+			return
+		self._attach(task)
+		if not task.deleted: self._move(self.position(task), min(pos, self._active.total - 1))
+		else: self._place(task, rank)
+
+	def _place(self, task: Task, rank: int) -> None:
+		# rotates the task from the last slot to a rank among all stored tasks, the tasks in between keep their order
+		slots = [self._active.select(k, self._deleted) for k in range(rank, self._active.total + self._deleted.total)]
+		if len(slots) < 2: return
+		for slot, moved in zip(slots, [task] + [self._task(slot) for slot in slots[:-1]]):
+			state = _DELETED if moved.deleted else _ACTIVE
+			if self._state[slot] != state:
+				delta = 1 if moved.deleted else -1
+				self._deleted.add(slot, delta)
+				self._active.add(slot, -delta)
+				self._state[slot] = state
+			self._slots[slot] = moved
+			moved._slot = slot
+		self._view = None
+		# stores only know moves within the active list, they write the order again
+		self._changed(None, "reorder", None)
+
+	def _unburn(self, task: Task) -> None:
+		# puts a task burned in the open batch back into its slot, slots are not compacted during a batch
+		slot = task._slot
+		self._state[slot] = _DELETED if task.deleted else _ACTIVE
+		(self._deleted if task.deleted else self._active).add(slot, 1)
+		self._slots[slot] = task
+		self._ids[task.id] = task
+		task._manager = self
+		self._burned -= 1
+		self._view = None
+
+	def _sync_deleted(self, task: Task) -> None:
+		slot = task._slot
+		state = _DELETED if task.deleted else _ACTIVE
+		if self._state[slot] == state: return
+		self._state[slot] = state
+		delta = 1 if task.deleted else -1
+		self._deleted.add(slot, delta)
+		self._active.add(slot, -delta)
+		self._view = None
+		self._clamp_scroll()
+
+	def _clamp_scroll(self) -> None:
+		# keep the viewport from scrolling past the last task of the view
+		if self.scroll_y > 0 and self.scroll_y >= self._count():
+			self.scroll_y = max(0, self._count() - self.max_items)
+
+	def _move(self, pos: int, new_pos: int) -> None:
+		# rotates the tasks between both active positions, O(distance * log n)
+		if pos == new_pos: return
+		step = 1 if new_pos > pos else -1
+		slots = [self._active.select(k) for k in range(pos, new_pos + step, step)]
+		moved = self._task(slots[0])
+		for slot, next_slot in zip(slots, slots[1:]):
+			task = self._task(next_slot)
+			self._slots[slot] = task
+			task._slot = slot
+		self._slots[slots[-1]] = moved
+		moved._slot = slots[-1]
+		self._view = None
+		self._changed(moved, "move", pos)
+
+def unique_ids(ids: array) -> bool:
+	# older save files may repeat ids, only an eager load lets _register give the repeats new ones
+	return len(set(ids)) == len(ids) and min(ids, default=0) >= 0
 
 def serialize_task(task) -> dict:
 	return {
 		"title": task.title,
 		"description": task.description,
 		"checked": task.checked,
-		"created_at": task.created_at,
-		"updated_at": task.updated_at,
+		"created_at": task.created,
+		"updated_at": task.updated,
 		"deleted": task.deleted,
 		"id": task.id
 	}
 
 def deserialize_task(data) -> Task:
 	task = Task(data["title"], data["checked"], data["description"], data["id"])
-	task._created_at = data["created_at"]
-	task._updated_at = data["updated_at"]
+	task._created_at = parse_time(data["created_at"])
+	task._updated_at = parse_time(data["updated_at"])
 	task._deleted = data["deleted"]
 	return task
\ No newline at end of file
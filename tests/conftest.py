@@ -0,0 +1,27 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# the modules live at the top of the repository, next to main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from daemon import Client, Daemon
+from storage import JsonFile
+
+@pytest.fixture
+def daemon(tmp_path):
+	path = str(tmp_path / "tasks.json")
+	daemon = Daemon(path, JsonFile(path), delay=0)
+	thread = threading.Thread(target=daemon.serve)
+	thread.start()
+	client = None
+	while client is None:
+		time.sleep(0.01)
+		client = Client.connect(path)
+	yield path, client
+	client.call("stop")
+	client.close()
+	thread.join(5)
@@ -0,0 +1,67 @@
+import io
+import json
+
+import pytest
+
+import cli
+from storage import JsonFile
+from task import TaskManager
+
+@pytest.fixture
+def tasks(tmp_path, monkeypatch, capsys):
+	# runs cli.py on a save file of its own, returns what it printed
+	path = str(tmp_path / "tasks.json")
+	monkeypatch.setenv("HOME", str(tmp_path))
+	def run(*argv: str, stdin: str="", status: int=0) -> str:
+		monkeypatch.setattr("sys.stdin", io.StringIO(stdin))
+		assert cli.run(["--file", path, *argv]) == status
+		return capsys.readouterr().out
+	run.path = path
+	return run
+
+def test_commands(tasks, tmp_path):
+	assert tasks("add", "milk", "-d", "2 litres", "-v") == "    0 ✕ milk — 2 litres\n"
+	tasks("add", stdin="eggs\nbread\tbrown\n")
+	assert tasks("count") == "3\n"
+	tasks("done", "1")
+	tasks("delete", "2")
+	tasks("done", "7", status=1)
+	assert tasks("list") == "    0 ✕ milk — 2 litres\n    1 ✓ eggs\n"
+	assert tasks("count", "--open") == "1\n"
+	assert tasks("count", "--deleted") == "1\n"
+	assert [task["title"] for task in json.loads(tasks("list", "--all", "--json"))] == ["milk", "eggs", "bread"]
+	assert tasks("search", "litres") == "    0 ✕ milk — 2 litres\n"
+	assert tasks("where", "checked", "|", "delete") == "    1 ✓ eggs\n"
+	assert tasks("count") == "1\n"
+	export = str(tmp_path / "backup.bin")
+	tasks("export", export)
+	tasks("delete", "--burn", "0")
+	tasks("import", export)
+	assert tasks("list", "--all") == "    1 ✓ eggs\n    2 ✕ bread — brown\n    3 ✕ milk — 2 litres\n    4 ✓ eggs\n    5 ✕ bread — brown\n"
+	tm = TaskManager()
+	JsonFile(tasks.path).load(tm)
+	assert [task.id for task in tm.all_tasks] == [1, 2, 3, 4, 5]
+
+def test_mode_is_found_from_the_save_files(tasks):
+	tasks("--mode", "journal", "add", "journaled")
+	assert tasks("list") == "    0 ✕ journaled\n"
+	with pytest.raises(SystemExit):
+		tasks("--mode", "file", "add", "lost")
+	assert tasks("list") == "    0 ✕ journaled\n"
+	# with the files of two modes next to it --mode has to pick one
+	open(tasks.path.replace(".json", ".bin"), "w").close()
+	with pytest.raises(SystemExit):
+		tasks("list")
+
+def test_remote_commands(daemon, monkeypatch, tmp_path, capsys):
+	path, client = daemon
+	monkeypatch.setenv("HOME", str(tmp_path))
+	monkeypatch.setattr("sys.stdin", io.StringIO("eggs\n"))
+	for argv in (["add", "milk"], ["add"], ["done", "1"], ["delete", "0"], ["count"], ["list", "--all"], ["search", "eggs"], ["where", "checked"]):
+		assert cli.run(["--file", path, *argv]) == 0
+	assert cli.run(["--file", path, "delete", "9"]) == 1
+	assert capsys.readouterr().out == "1\n    0 ✕ milk\n    1 ✓ eggs\n    1 ✓ eggs\n    1 ✓ eggs\n"
+	assert client.call("count")["all"] == 2
+	# export reads the file, the daemon writes out what it holds first
+	assert cli.run(["--file", path, "export", str(tmp_path / "backup.json")]) == 0
+	with open(tmp_path / "backup.json") as f: assert [task["title"] for task in json.load(f)["tasks"]] == ["milk", "eggs"]
@@ -0,0 +1,45 @@
+import json
+import socket
+
+import pytest
+
+from daemon import METHOD_NOT_FOUND, PARSE_ERROR, Client, DaemonError, run, socket_path
+from storage import JsonFile
+from task import TaskManager
+
+def test_calls_and_batches(daemon):
+	path, client = daemon
+	added = client.batch([("add", {"title": "milk"}), ("add", {"title": "eggs", "checked": True}), ("add", {"title": "bread"})])
+	assert [task["id"] for task in added] == [0, 1, 2]
+	client.call("delete", id=2)
+	assert client.call("count") == {"active": 2, "open": 1, "checked": 1, "deleted": 1, "all": 3}
+	assert [task["title"] for task in client.call("list")] == ["milk", "eggs"]
+	assert [task["title"] for task in client.call("where", query="open | check")] == ["milk"]
+	assert client.call("toggle", id=9) is None
+
+def test_save_writes_the_file(daemon):
+	path, client = daemon
+	client.call("add", title="saved")
+	client.call("save")
+	tm = TaskManager()
+	JsonFile(path).load(tm)
+	assert [task.title for task in tm.all_tasks] == ["saved"]
+
+def test_errors(daemon):
+	path, client = daemon
+	with pytest.raises(DaemonError) as error:
+		client.call("shred")
+	assert error.value.code == METHOD_NOT_FOUND
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	sock.connect(socket_path(path))
+	sock.sendall(b"{not json\n")
+	assert json.loads(sock.makefile("rb").readline())["error"]["code"] == PARSE_ERROR
+	sock.close()
+
+def test_no_daemon(tmp_path):
+	assert Client.connect(str(tmp_path / "tasks.json")) is None
+
+def test_refuses_another_mode(tmp_path):
+	(tmp_path / "tasks.journal").touch()
+	with pytest.raises(SystemExit):
+		run(["--file", str(tmp_path / "tasks.json"), "--mode", "file"])
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from history import History
+from storage import BinaryFile, Journal, JsonFile, SqliteStore, export_tasks, read_document
+from task import TaskManager, format_time, parse_time, serialize_task
+
+STORES = {
+	"json": lambda path: JsonFile(f"{path}.json"),
+	"lazy": lambda path: JsonFile(f"{path}.json", lazy=True),
+	"columnar": lambda path: JsonFile(f"{path}.json", columnar=True),
+	"journal": lambda path: Journal(f"{path}.json", compact_after=8),
+	"binary": lambda path: BinaryFile(f"{path}.bin"),
+	"sqlite": lambda path: SqliteStore(f"{path}.db"),
+}
+
+def edit(tm: TaskManager) -> None:
+	for i in range(12): tm.add(f"task {i}", f"about {i}" if i % 3 else "")
+	tm.get(2).toggle()
+	tm.get(4).delete()
+	tm.get(5).title = "renamed ünïcode"
+	tm.burn(7)
+	tm.move_to(9, 0)
+
+@pytest.mark.parametrize("name", STORES)
+def test_round_trip(tmp_path, name):
+	path = str(tmp_path / "tasks")
+	tm, store = TaskManager(), STORES[name](path)
+	store.load(tm)
+	edit(tm)
+	store.save(tm)
+	# a second round of edits on top of the first save, the journal appends these
+	tm.get(3).description = "second save"
+	tm.add("added later")
+	store.save(tm)
+	reopened = TaskManager()
+	STORES[name](path).load(reopened)
+	assert [serialize_task(task) for task in reopened.all_tasks] == [serialize_task(task) for task in tm.all_tasks]
+	assert reopened.next_id == tm.next_id
+
+@pytest.mark.parametrize("name", STORES)
+def test_undone_burn_reloads_in_place(tmp_path, name):
+	path = str(tmp_path / "tasks")
+	tm, store = TaskManager(), STORES[name](path)
+	store.load(tm)
+	history = History(tm, 10)
+	for title in "abc": tm.add(title)
+	store.save(tm)
+	history.checkpoint()
+	tm.delete(2)
+	history.checkpoint()
+	tm.burn(1)
+	history.checkpoint()
+	for deleted in (["c"], []):
+		history.undo()
+		store.save(tm)
+		reopened = TaskManager()
+		STORES[name](path).load(reopened)
+		assert [task.title for task in reopened.all_tasks] == ["a", "b", "c"]
+		assert [task.title for task in reopened.deleted_tasks] == deleted
+
+@pytest.mark.parametrize("suffix", [".json", ".bin"])
+def test_export_reads_back(tmp_path, suffix):
+	tm = TaskManager()
+	edit(tm)
+	path = str(tmp_path / f"export{suffix}")
+	export_tasks(tm, path)
+	assert read_document(path)["tasks"] == [serialize_task(task) for task in tm.all_tasks]
+
+def test_timestamps_are_epoch_milliseconds(tmp_path):
+	path = tmp_path / "tasks.json"
+	legacy = {"title": "old", "description": "", "checked": False, "created_at": "2024-05-01 12:30:00", "updated_at": "2024-05-01T12:31:00", "deleted": False, "id": 0}
+	path.write_text(json.dumps([legacy]))
+	tm = TaskManager()
+	JsonFile(str(path)).load(tm)
+	task = tm.get(0)
+	assert task.created == parse_time("2024-05-01 12:30:00")
+	assert task.updated - task.created == 60_000
+	assert format_time(task.created).startswith("2024-05-01")
+	assert serialize_task(task)["created_at"] == task.created
@@ -0,0 +1,64 @@
+import random
+
+from history import History
+from task import TaskManager
+
+def make(n: int) -> tuple[TaskManager, History]:
+	tm = TaskManager()
+	history = History(tm, 1000)
+	for i in range(n): tm.add(f"task {i}")
+	history.checkpoint()
+	return tm, history
+
+def snapshot(tm: TaskManager) -> tuple[list[int], list[int]]:
+	return [task.id for task in tm.all_tasks], [task.id for task in tm.deleted_tasks]
+
+def test_undo_burn_of_deleted_task_after_compaction():
+	tm, history = make(200)
+	tm.delete(5)
+	history.checkpoint()
+	before = snapshot(tm)
+	tm.burn(5)
+	history.checkpoint()
+	layout = tm.layout
+	with tm.batch():
+		for task_id in range(100, 200): tm.burn(task_id)
+	assert tm.layout != layout
+	history.undo()
+	history.undo()
+	assert snapshot(tm) == before
+	tm.restore(5)
+	assert tm.position(tm.get(5)) == 5
+
+def test_undo_restores_trash_order_after_random_edits():
+	for seed in range(20):
+		rng = random.Random(seed)
+		tm, history = make(150)
+		snapshots = []
+		for _ in range(100):
+			before, active, deleted = snapshot(tm), tm.active_tasks, tm.deleted_tasks
+			roll = rng.random()
+			if roll < 0.4 and active:
+				with tm.batch():
+					for task in rng.sample(active, min(len(active), 5)): task.delete()
+			elif roll < 0.6 and deleted:
+				rng.choice(deleted).restore()
+			elif deleted:
+				with tm.batch():
+					for task in rng.sample(deleted, min(len(deleted), rng.randint(1, 40))): tm.burn(task.id)
+			else:
+				continue
+			history.checkpoint()
+			snapshots.append(before)
+		for before in reversed(snapshots):
+			history.undo()
+			assert snapshot(tm) == before
+
+def test_undo_and_redo_of_a_toggle():
+	tm, history = make(3)
+	tm.get(1).toggle()
+	history.checkpoint()
+	assert history.undo() is tm.get(1)
+	assert not tm.get(1).checked
+	history.redo()
+	assert tm.get(1).checked
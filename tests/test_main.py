@@ -0,0 +1,141 @@
+import curses
+import json
+
+import pytest
+
+pytest.importorskip("envutils")
+
+import main
+
+class FakeScreen:
+	# enough of curses.window for Application, keys are handed out by getch() in order
+	def __init__(self, keys: list[int]=(), height: int=30, width: int=100) -> None:
+		self.keys = list(keys)
+		self.height, self.width = height, width
+		self.lines: dict[int, str] = {}
+		self.drawn: list[int] = []
+	def getmaxyx(self) -> tuple[int, int]: return self.height, self.width
+	def addstr(self, y: int, x: int, text: str, attr: int=0) -> None:
+		if not 0 <= y < self.height: raise curses.error("addstr() returned ERR")
+		self.drawn.append(y)
+		self.lines[y] = self.lines.get(y, "")[:x].ljust(x) + text
+	def clrtoeol(self) -> None: pass
+	def move(self, y: int, x: int) -> None: pass
+	def refresh(self) -> None: pass
+	def noutrefresh(self) -> None: pass
+	def clear(self) -> None: self.lines = {}
+	def erase(self) -> None: self.lines = {}
+	def keypad(self, flag: bool) -> None: pass
+	def nodelay(self, flag: bool) -> None: pass
+	def timeout(self, delay: int) -> None: pass
+	def getch(self, *args) -> int:
+		if not self.keys: return -1
+		key = self.keys.pop(0)
+		if isinstance(key, BaseException): raise key
+		return key
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+	monkeypatch.setenv("HOME", str(tmp_path))
+	for name in ("curs_set", "start_color", "use_default_colors", "init_pair", "doupdate"):
+		monkeypatch.setattr(curses, name, lambda *args: None)
+	monkeypatch.setattr(curses, "color_pair", lambda pair: pair << 8)
+	monkeypatch.setitem(main.settings, "watch", False)
+	monkeypatch.setitem(main.settings, "daemon", False)
+	def make(tasks: int=0, keys: list=(), **settings) -> main.Application:
+		for key, value in settings.items(): monkeypatch.setitem(main.settings, key, value)
+		app = main.Application()
+		app.run_control_sequence = lambda sequence: None
+		app.stdscr = FakeScreen(keys)
+		for i in range(tasks): app.tm.add(f"task {i}")
+		app.tm.max_items = app.height - 9
+		return app
+	return make
+
+def test_stats_are_dumped_after_ctrl_c(make_app, tmp_path):
+	path = tmp_path / "stats.json"
+	app = make_app(3, stats=True, stats_file=str(path))
+	with pytest.raises(KeyboardInterrupt):
+		app.main_loop(FakeScreen([ord("j"), -1, KeyboardInterrupt()]))
+	assert "check_keys" in json.loads(path.read_text())["histograms"]
+
+def test_moving_the_selection_redraws_two_list_rows(make_app):
+	app = make_app(10)
+	app.render()
+	app.stdscr.drawn = []
+	app.render()
+	assert app.stdscr.drawn == []
+	app.tm.next()
+	app.render()
+	# the description panel below the list shows the new task too
+	assert sorted({y for y in app.stdscr.drawn if y < app.height - 7}) == [2, 3]
+	assert app.stdscr.lines[3].startswith("  ✕ task 1")
+
+def test_compiled_keybindings():
+	bindings, dispatch = main.compile_keybindings({"j": ["next task"], ord("j"): ["quit"], curses.KEY_DOWN: ["special:arrow pressed", "next task", "unknown"]})
+	# the first binding of a key wins, dispatch lists known events in EVENTS order
+	assert bindings[ord("j")] == ["next task"]
+	assert dispatch[curses.KEY_DOWN] == ["next task", "special:arrow pressed"]
+
+def test_check_keys_filters_and_follows_bind(make_app, monkeypatch):
+	monkeypatch.setitem(main.settings, "keybindings", dict(main.settings.keybindings))
+	app = make_app()
+	assert app.check_keys(curses.KEY_DOWN) == ["next task", "special:arrow pressed"]
+	assert app.check_keys(curses.KEY_DOWN, blacklist=["next task"]) == ["special:arrow pressed"]
+	assert app.check_keys(curses.KEY_DOWN, whitelist=["move task", "special:arrow pressed"], use_whitelist=True) == ["special:arrow pressed"]
+	assert app.check_keys(ord("~")) == []
+	app.bind("~", ["undo"])
+	assert app.check_keys(ord("~")) == ["undo"]
+	assert app.keyevent("~") == ["undo"]
+
+def test_search_command_cycles_through_matches(make_app):
+	app = make_app(40)
+	app.tm.get(3).set_title("buy milk")
+	app.tm.get(35).set_description("milk too")
+	app.handle_actions(["search milk"], True, True)
+	assert app.tm.current_task.id == 3
+	app.handle_actions(["/"], True, True)
+	assert app.tm.current_task.id == 35
+	assert app.custom_message == "Match 2/2: 'task 35'"
+	app.handle_actions(["/"], True, True)
+	assert app.tm.current_task.id == 3
+
+def test_held_keys_are_coalesced_into_one_jump(make_app, monkeypatch):
+	j, k = ord("j"), ord("k")
+	app = make_app(40, keys=[j, j, j, k])
+	monkeypatch.setattr(curses, "ungetch", lambda key: app.stdscr.keys.insert(0, key))
+	key = app.read_key()
+	actions = app.check_keys(key)
+	repeat = app.coalesce(key, actions)
+	assert (repeat, app.coalesced, app.stdscr.keys) == (3, 2, [k])
+	app.handle_actions(actions, repeat=repeat)
+	assert app.tm.current_task.id == 3
+	# other keys are never merged
+	assert app.coalesce(ord("a"), app.check_keys(ord("a"))) == 1
+
+def test_trash_draws_only_the_visible_window(make_app):
+	app = make_app(100)
+	for task_id in range(100): app.tm.delete(task_id)
+	app.trash_mode = True
+	app.render()
+	rows = app.tm.trash.rows
+	assert rows < 100 and max(app.stdscr.drawn) < app.height
+	for _ in range(rows + 2): app.handle_actions(["next task"])
+	app.render()
+	assert app.tm.trash.scroll_y == 3 and app.stdscr.lines[3].startswith("  3 ✕ task 3")
+	app.handle_actions(["recover task"])
+	assert not app.tm.get(rows + 2).deleted and app.tm.deleted_count == 99
+
+def test_switching_lists_keeps_one_loaded_and_saves_the_rest(make_app, tmp_path):
+	app = make_app(2, lists_in_memory=2)
+	tm = app.tm
+	app.handle_actions(["list work"], True, True)
+	app.tm.add("work task")
+	app.handle_actions(["list home"], True, True)
+	assert list(app.lists.lists) == ["work"]
+	app.handle_actions(["list tasks"], True, True)
+	# tasks was pushed out by work and parsed again
+	assert app.tm is not tm and [task.title for task in app.tm.all_tasks] == ["task 0", "task 1"]
+	assert list(app.lists.lists) == ["home"]
+	counts = json.loads((tmp_path / ".config/tertask/lists.json").read_text())["lists"]
+	assert (counts["work"]["active"], counts["tasks"]["active"]) == (1, 2)
@@ -0,0 +1,105 @@
+import itertools
+
+import pytest
+
+from storage import Journal, JsonFile, SaveConflict
+from task import TaskManager
+
+STORES = {
+	"json": JsonFile,
+	"journal": Journal,
+}
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+	# every edit gets a later updated_at, however fast the test runs
+	ticks = itertools.count(1_000_000)
+	monkeypatch.setattr("task.curr_time", lambda: next(ticks))
+
+def open_list(store_class, path: str) -> TaskManager:
+	tm = TaskManager()
+	store_class(path).load(tm)
+	return tm
+
+def instances(tmp_path, name: str, titles: str="abc") -> tuple[str, TaskManager, TaskManager]:
+	path = str(tmp_path / "tasks.json")
+	first = open_list(STORES[name], path)
+	for title in titles: first.add(title)
+	first.store.save(first)
+	return path, open_list(STORES[name], path), open_list(STORES[name], path)
+
+def titles(tm: TaskManager) -> list[str]:
+	return [task.title for task in tm.all_tasks]
+
+@pytest.mark.parametrize("name", STORES)
+def test_newer_edit_wins(tmp_path, name):
+	path, ours, theirs = instances(tmp_path, name)
+	theirs.get(0).set_title("older")
+	theirs.get(1).set_title("theirs only")
+	ours.get(0).set_title("newer")
+	theirs.store.save(theirs)
+	conflicts = ours.store.save_merged(ours)
+	assert [task.id for task in conflicts] == [0]
+	assert titles(ours) == ["newer", "theirs only", "c"]
+	assert titles(open_list(STORES[name], path)) == ["newer", "theirs only", "c"]
+
+@pytest.mark.parametrize("name", STORES)
+def test_older_edit_loses(tmp_path, name):
+	path, ours, theirs = instances(tmp_path, name)
+	ours.get(2).set_title("older")
+	theirs.get(2).set_title("newer")
+	theirs.store.save(theirs)
+	assert [task.id for task in ours.store.save_merged(ours)] == [2]
+	assert titles(open_list(STORES[name], path)) == ["a", "b", "newer"]
+
+@pytest.mark.parametrize("name", STORES)
+def test_same_new_id_is_rekeyed(tmp_path, name):
+	path, ours, theirs = instances(tmp_path, name)
+	theirs.add("theirs")
+	ours.add("ours")
+	theirs.store.save(theirs)
+	assert ours.store.save_merged(ours) == []
+	assert ours.get(3).title == "theirs"
+	assert ours.get(4).title == "ours"
+	reopened = open_list(STORES[name], path)
+	assert sorted(titles(reopened)) == ["a", "b", "c", "ours", "theirs"]
+	assert reopened.next_id == 5
+
+@pytest.mark.parametrize("name", STORES)
+def test_burn_on_the_other_side(tmp_path, name):
+	path, ours, theirs = instances(tmp_path, name)
+	theirs.burn(0)
+	theirs.burn(1)
+	ours.get(1).set_title("kept")
+	theirs.store.save(theirs)
+	# the untouched task goes, the one edited here is saved again and reported
+	assert [task.title for task in ours.store.save_merged(ours)] == ["kept"]
+	assert titles(open_list(STORES[name], path)) == ["kept", "c"]
+
+@pytest.mark.parametrize("name", STORES)
+def test_write_in_between_forces_a_retry(tmp_path, name):
+	path, ours, theirs = instances(tmp_path, name)
+	store = ours.store
+	prepare = store.prepare
+	def racing(tm):
+		# the other instance saves after the merge check, the write has to notice it and merge again
+		store.prepare = prepare
+		theirs.get(0).set_title("theirs")
+		theirs.store.save(theirs)
+		return prepare(tm)
+	store.prepare = racing
+	ours.get(1).set_title("ours")
+	synced = store.synced
+	assert store.save_merged(ours) == []
+	assert store.synced != synced
+	assert titles(open_list(STORES[name], path)) == ["theirs", "ours", "c"]
+
+@pytest.mark.parametrize("name", STORES)
+def test_write_refuses_a_changed_file(tmp_path, name):
+	path, ours, theirs = instances(tmp_path, name)
+	theirs.add("theirs")
+	theirs.store.save(theirs)
+	ours.add("ours")
+	with pytest.raises(SaveConflict):
+		ours.store.save(ours)
+	assert titles(open_list(STORES[name], path)) == ["a", "b", "c", "theirs"]
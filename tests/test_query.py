@@ -0,0 +1,39 @@
+import pytest
+
+from query import QueryError, compile_query
+from task import TaskManager
+
+@pytest.fixture
+def tm() -> TaskManager:
+	tm = TaskManager()
+	for i, title in enumerate(["buy milk", "call mom", "fix bug", "milk the cow", "write report"]):
+		task = tm.add(f"{title} {i}")
+		if i % 2: task.toggle()
+	tm.get(4).delete()
+	return tm
+
+def brute(tm: TaskManager, predicate) -> list[int]:
+	return [task.id for task in tm.all_tasks if predicate(task)]
+
+@pytest.mark.parametrize("text, predicate", [
+	("checked", lambda task: task.checked and not task.deleted),
+	("deleted", lambda task: task.deleted),
+	("open and title has milk", lambda task: not task.checked and not task.deleted and "milk" in task.title.split()),
+	('title has "!!"', lambda task: not task.deleted),
+	('title has "!!" and checked', lambda task: task.checked and not task.deleted),
+	("not checked or id = 3", lambda task: not task.deleted and (not task.checked or task.id == 3)),
+	("deleted or id = 3", lambda task: task.deleted or task.id == 3),
+])
+def test_planned_query_matches_every_task_the_predicate_does(tm, text, predicate):
+	assert [task.id for task in compile_query(text).select(tm)] == brute(tm, predicate)
+
+def test_action_is_one_batch(tm):
+	generation = tm.generation
+	compile_query("title has milk | check").run(tm)
+	assert tm.generation == generation + 1
+	assert all(task.checked for task in tm.all_tasks if "milk" in task.title)
+
+@pytest.mark.parametrize("text", ["title", "title ~", "(checked", "checked | shred", "id = x", "created_at < soon", "id ~ 1"])
+def test_invalid_queries_raise(text):
+	with pytest.raises(QueryError):
+		compile_query(text)
@@ -0,0 +1,29 @@
+from search import SearchIndex
+from task import TaskManager
+
+def test_index_follows_edits():
+	index = SearchIndex()
+	index.index(1, "Buy milk")
+	index.index(2, "milk the cow, buy hay")
+	assert index.query("MILK buy") == {1, 2}
+	index.index(1, "Buy bread")
+	assert index.query("milk") == {2}
+	index.remove(2)
+	assert index.query("milk") == set()
+	assert index.query("") == set()
+	assert len(index) == 1
+
+def test_search_follows_the_task_list():
+	tm = TaskManager()
+	for title in ("milk", "eggs", "more milk", "bread"): tm.add(title)
+	assert [task.id for task in tm.search("milk")] == [0, 2]
+	tm.get(1).set_description("with milk")
+	tm.get(0).set_title("cream")
+	tm.delete(2)
+	tm.add("milk again")
+	tm.move_to(4, 0)
+	assert [task.id for task in tm.search("milk")] == [4, 1]
+	tm.burn(4)
+	tm.restore(2)
+	# the move rotated the active tasks past the deleted one
+	assert [task.id for task in tm.search("milk")] == [2, 1]
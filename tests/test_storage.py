@@ -0,0 +1,74 @@
+import random
+import sqlite3
+
+import pytest
+
+from storage import BinaryFile, Journal, JsonFile, SqliteStore
+from task import TaskManager
+
+def order(tm: TaskManager) -> tuple[list[int], list[int]]:
+	return [task.id for task in tm.all_tasks], [task.id for task in tm.deleted_tasks]
+
+def test_sqlite_keeps_trash_order_through_moves(tmp_path):
+	path = str(tmp_path / "tasks.db")
+	tm = TaskManager()
+	store = SqliteStore(path)
+	store.load(tm)
+	rng = random.Random(1)
+	for i in range(40): tm.add(f"task {i}")
+	for task_id in rng.sample(range(40), 15): tm.delete(task_id)
+	for _ in range(60):
+		tm.move_to(rng.choice(tm.active_tasks).id, rng.randrange(tm.active_count))
+		assert [task.id for task in tm.filter(deleted=True)] == [task.id for task in tm.deleted_tasks]
+	tm.restore(tm.deleted_tasks[3].id)
+	store.save(tm)
+	store.db.close()
+	reopened = TaskManager()
+	SqliteStore(path).load(reopened)
+	assert order(reopened) == order(tm)
+
+@pytest.mark.parametrize("store", [JsonFile, Journal, BinaryFile])
+def test_prepared_save_writes_the_tasks_stored_when_it_was_prepared(tmp_path, store):
+	path = str(tmp_path / ("tasks.bin" if store is BinaryFile else "tasks.json"))
+	tm, saver = TaskManager(), store(path)
+	saver.load(tm)
+	for i in range(5): tm.add(f"task {i}")
+	job = saver.prepare(tm)
+	tm.add("after")
+	tm.burn(0)
+	job()
+	reopened = TaskManager()
+	store(path).load(reopened)
+	assert [task.title for task in reopened.all_tasks] == [f"task {i}" for i in range(5)]
+
+def test_sqlite_read_loads_without_following(tmp_path):
+	path = str(tmp_path / "tasks.db")
+	tm, store = TaskManager(), SqliteStore(path)
+	store.load(tm)
+	for i in range(3): tm.add(f"task {i}")
+	tm.delete(1)
+	store.save(tm)
+	disk = TaskManager()
+	store.read(disk)
+	disk.add("not stored")
+	assert order(disk)[1] == [1]
+	assert [task.title for task in tm.all_tasks] == [f"task {i}" for i in range(3)]
+	assert store.query() == [0, 1, 2]
+
+def test_sqlite_commits_whole_batches(tmp_path):
+	path = str(tmp_path / "tasks.db")
+	tm = TaskManager()
+	store = SqliteStore(path)
+	store.load(tm)
+	tm.add("first")
+	jobs = [store.prepare(tm)]
+	# the autosave worker runs the prepared commit while the next batch is being published
+	tm.subscribe(lambda event, task, old: jobs and jobs.pop()())
+	with tm.batch():
+		tm.add("a")
+		tm.add("b")
+	reader = sqlite3.connect(path)
+	assert reader.execute("SELECT title FROM tasks").fetchall() == []
+	store.save(tm)
+	assert reader.execute("SELECT title FROM tasks ORDER BY position").fetchall() == [("first",), ("a",), ("b",)]
+	reader.close()
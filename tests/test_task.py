@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from storage import JsonFile
+from task import TaskManager, serialize_task
+
+def legacy(ids: list[int]) -> list[dict]:
+	return [{"title": f"task {i}", "description": "", "checked": False, "created_at": 0, "updated_at": 0, "deleted": False, "id": task_id} for i, task_id in enumerate(ids)]
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_load_gives_repeated_ids_new_ones(columnar):
+	tm = TaskManager()
+	tm.load_serialized_tasks(legacy([0, 0, -1]), columnar)
+	ids = [task.id for task in tm.all_tasks]
+	assert len(set(ids)) == 3 and min(ids) >= 0
+	tm.burn(ids[0])
+	assert tm.get(ids[1]) is tm.all_tasks[0]
+
+@pytest.mark.parametrize("lazy, columnar", [(True, False), (False, True)])
+def test_lazy_load_gives_repeated_ids_new_ones(tmp_path, lazy, columnar):
+	path = tmp_path / "tasks.json"
+	path.write_text(json.dumps({"next_id": 1, "tasks": legacy([0, 0])}))
+	tm = TaskManager()
+	JsonFile(str(path), lazy, columnar).load(tm)
+	first, second = tm.all_tasks
+	assert first.id != second.id
+	tm.burn(first.id)
+	assert tm.get(second.id) is second
+
+def test_tasks_added_to_a_columnar_list_survive_compaction():
+	source = TaskManager()
+	for i in range(300): source.add(f"task {i}")
+	tm = TaskManager()
+	tm.load_serialized_tasks(source.serialize(), columnar=True)
+	added = [tm.add(f"added {i}") for i in range(10)]
+	for task_id in range(200): tm.burn(task_id)
+	assert [serialize_task(task) for task in tm.all_tasks[-10:]] == [serialize_task(task) for task in added]
+	assert len(tm.all_tasks) == 110
+
+def test_failed_batch_leaves_no_trace():
+	tm = TaskManager()
+	tm.max_items = 100
+	for i in range(10): tm.add(f"task {i}", "milk" if i % 2 else "")
+	tm.delete(3)
+	views = {}
+	for name in ("open", "title"):
+		tm.set_view(name)
+		views[name] = tm.tasks
+	state = ([task.id for task in tm.all_tasks], [task.id for task in tm.deleted_tasks], tm.next_id, tm.generation, tm.search("milk"))
+	events = []
+	tm.subscribe(lambda event, task, old: events.append(event))
+	with pytest.raises(RuntimeError):
+		with tm.batch():
+			tm.add("added", "milk")
+			tm.move_to(0, 5)
+			tm.get(1).set_title("renamed")
+			tm.get(5).toggle()
+			tm.delete(7)
+			tm.burn(9)
+			tm.burn(3)
+			raise RuntimeError
+	assert ([task.id for task in tm.all_tasks], [task.id for task in tm.deleted_tasks], tm.next_id, tm.generation, tm.search("milk")) == state
+	assert tm.get(1).title == "task 1" and not tm.get(5).checked
+	for name in ("title", "open"):
+		tm.set_view(name)
+		assert tm.tasks == views[name]
+	assert events == []
@@ -0,0 +1,89 @@
+import pytest
+
+from task import TaskManager
+from views import Pager, SortedIndex, step_window
+
+@pytest.mark.parametrize("scroll_y, selected, count, expected", [
+	(0, 3, 1, (0, 4)), # within the window
+	(0, 4, 1, (1, 4)), # off the bottom, scrolls by one
+	(0, 2, 12, (10, 4)), # a page and more, the target ends up on the last row
+	(5, 0, -2, (3, 0)), # off the top
+	(15, 4, 1, (0, 0)), # past the end, wraps to the top
+	(0, 0, -1, (15, 4)), # before the start, wraps to the bottom
+])
+def test_step_window(scroll_y, selected, count, expected):
+	assert step_window(scroll_y, selected, count, 20, 5) == expected
+
+def test_sorted_index():
+	index = SortedIndex([("b", 1), ("a", 2), ("c", 3)])
+	assert [index.select(pos) for pos in range(3)] == [2, 1, 3]
+	assert index.insert(2, "d") and not index.insert(2, "d")
+	assert index.rank(2) == 2 and index.rank(1) == 0
+	index.remove(1)
+	assert index.rank(1) is None and len(index) == 2
+	reverse = SortedIndex([(1, 1), (2, 2)], reverse=True)
+	assert reverse.select(0) == 2 and reverse.rank(2) == 0
+
+def make() -> TaskManager:
+	tm = TaskManager()
+	tm.max_items = 3
+	for title in ("pear", "Apple", "fig", "kiwi", "date"): tm.add(title)
+	tm.get(1).toggle()
+	tm.get(3).toggle()
+	return tm
+
+def shown(tm: TaskManager) -> list[str]:
+	# the whole view, a window at a time
+	titles = []
+	tm.scroll_y = 0
+	while tm.scroll_y < tm._count():
+		titles += [task.title for task in tm.tasks]
+		tm.scroll_y += tm.max_items
+	tm.scroll_y = 0
+	return titles
+
+def test_views_follow_edits():
+	tm = make()
+	tm.set_view("title")
+	assert shown(tm) == ["Apple", "date", "fig", "kiwi", "pear"]
+	tm.get(0).set_title("banana")
+	tm.delete(2)
+	assert shown(tm) == ["Apple", "banana", "date", "kiwi"]
+	tm.set_view("open")
+	assert shown(tm) == ["banana", "date", "Apple", "kiwi"]
+	tm.get(4).toggle()
+	assert shown(tm) == ["banana", "Apple", "kiwi", "date"]
+	tm.set_view("checked")
+	assert shown(tm) == ["Apple", "kiwi", "date"]
+	tm.set_view("updated")
+	assert shown(tm)[0] == "date"
+	with pytest.raises(ValueError):
+		tm.set_view("size")
+
+def test_navigation_and_selection_follow_the_view():
+	tm = make()
+	tm.set_view("title")
+	# switching keeps the current task selected
+	assert (tm.scroll_y, tm.selected, tm.current_task.title) == (2, 2, "pear")
+	tm.next()
+	assert (tm.scroll_y, tm.selected, tm.current_task.title) == (0, 0, "Apple")
+	for _ in range(3): tm.next()
+	assert (tm.scroll_y, tm.selected, tm.current_task.title) == (1, 2, "kiwi")
+	tm.set_view("list")
+	assert tm.current_task.title == "kiwi" and tm.position(tm.current_task) == 3
+def test_pager_pages_through_the_trash():
+	tm = make()
+	for task_id in range(5): tm.delete(task_id)
+	tm.trash.rows = 2
+	assert [task.title for task in tm.trash_tasks()] == ["pear", "Apple"]
+	tm.trash.step(3)
+	assert (tm.trash.scroll_y, tm.trash.selected) == (2, 1)
+	assert [task.title for task in tm.trash_tasks()] == ["fig", "kiwi"]
+	assert tm.trash_task.title == "kiwi"
+	tm.burn(4)
+	tm.burn(3)
+	tm.trash.clamp()
+	assert tm.trash.position == 2 and tm.trash_task.title == "fig"
+	pager = Pager(lambda: 0)
+	pager.step(1)
+	assert pager.position == 0
@@ -0,0 +1,33 @@
+import json
+
+from task import TaskManager
+from workspace import DEFAULT_LIST, ListCache, ListIndex, list_path, valid_name
+
+def test_cache_evicts_the_least_recently_used_list():
+	cache = ListCache(keep=2)
+	assert cache.stash("a", {"name": "a"}) == []
+	assert cache.stash("b", {"name": "b"}) == []
+	# stashing a again makes b the oldest
+	assert cache.stash("a", {"name": "a"}) == []
+	assert cache.stash("c", {"name": "c"}) == [{"name": "b"}]
+	assert cache.take("b") is None
+	assert cache.take("a") == {"name": "a"}
+	assert list(cache.lists) == ["c"]
+	assert ListCache(keep=0).stash("a", {}) == [{}]
+
+def test_index_counts_lists_without_opening_them(tmp_path):
+	folder = str(tmp_path)
+	index = ListIndex(folder)
+	assert index.read() == {} and index.names() == [DEFAULT_LIST]
+	tm = TaskManager()
+	for title in "abc": tm.add(title)
+	tm.delete(1)
+	index.update("work", tm)
+	(tmp_path / "home.json").write_text(json.dumps({"next_id": 0, "tasks": []}))
+	assert {key: value for key, value in index.read()["work"].items() if key != "updated_at"} == {"active": 2, "deleted": 1}
+	assert index.names() == ["home", DEFAULT_LIST, "work"]
+	assert list_path(folder, "work") == str(tmp_path / "work.json")
+
+def test_list_names():
+	assert valid_name("work-2_b")
+	assert not valid_name("../tasks") and not valid_name("") and not valid_name("lists")
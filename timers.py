@@ -0,0 +1,32 @@
+import heapq
+import math
+import time
+from typing import Callable
+
+class Timers:
+	# periodic callbacks of the main loop, it waits for keys only until the next one is due instead of polling on threads
+	def __init__(self) -> None:
+		self._heap: list[tuple[float, int, float, Callable[[], object]]] = []
+		self._added = 0
+
+	def every(self, interval: float, callback: Callable[[], object]) -> None:
+		# callback returns something truthy when the screen has to be redrawn
+		self._added += 1
+		heapq.heappush(self._heap, (time.monotonic() + interval, self._added, interval, callback))
+
+	def timeout(self) -> int:
+		# milliseconds until the next timer is due, -1 to wait forever
+		if not self._heap: return -1
+		return max(0, math.ceil((self._heap[0][0] - time.monotonic()) * 1000))
+
+	def run(self) -> bool:
+		# runs the timers that are due, True when one of them asked for a redraw
+		now = time.monotonic()
+		redraw = False
+		while self._heap and self._heap[0][0] <= now:
+			due, added, interval, callback = heapq.heappop(self._heap)
+			if callback(): redraw = True
+			# a timer that fell behind skips the runs it missed
+			due += interval
+			heapq.heappush(self._heap, (due if due > now else now + interval, added, interval, callback))
+		return redraw
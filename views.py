@@ -0,0 +1,77 @@
+from bisect import bisect_left, insort
+from typing import Any, Callable, Iterable
+
+# list order, open tasks before checked ones (both in list order), checked tasks only, then the sorted views
+VIEWS = ("list", "open", "checked", "created", "updated", "title")
+
+# key of every sorted view and whether it is shown in descending order
+SORT_KEYS: dict[str, tuple[Callable[[Any], Any], bool]] = {
+	"created": (lambda task: task.created, False),
+	"updated": (lambda task: task.updated, True),
+	"title": (lambda task: task.title.lower(), False),
+}
+
+class SortedIndex:
+	# task ids ordered by key, edits move a single entry instead of sorting again
+	def __init__(self, items: Iterable[tuple[Any, int]]=(), reverse: bool=False) -> None:
+		self.items = sorted(items)
+		self.keys = {task_id: key for key, task_id in self.items}
+		self.reverse = reverse
+
+	def __len__(self) -> int: return len(self.items)
+
+	def insert(self, task_id: int, key) -> bool:
+		# returns whether the order changed
+		if self.keys.get(task_id) == key: return False
+		self.remove(task_id)
+		insort(self.items, (key, task_id))
+		self.keys[task_id] = key
+		return True
+
+	def remove(self, task_id: int) -> bool:
+		key = self.keys.pop(task_id, None)
+		if key is None: return False
+		del self.items[bisect_left(self.items, (key, task_id))]
+		return True
+
+	def select(self, pos: int) -> int:
+		return self.items[len(self.items) - 1 - pos if self.reverse else pos][1]
+
+	def rank(self, task_id: int) -> int | None:
+		key = self.keys.get(task_id)
+		if key is None: return None
+		pos = bisect_left(self.items, (key, task_id))
+		return len(self.items) - 1 - pos if self.reverse else pos
+
+def step_window(scroll_y: int, selected: int, count: int, total: int, rows: int) -> tuple[int, int]:
+	# scroll_y and selected after moving the selection by count rows, scrolling as little as possible
+	# past either end it wraps around, forward to the top and backward to the bottom
+	pos = scroll_y + selected + count
+	if 0 <= pos < total:
+		scroll_y = max(scroll_y, pos - rows + 1) if count > 0 else min(scroll_y, pos)
+	else:
+		pos %= total
+		scroll_y = max(0, pos - rows + 1) if count > 0 else min(max(0, total - rows), pos)
+	return scroll_y, pos - scroll_y
+
+class Pager:
+	# scroll position and selection of a list that is only ever read one window of rows at a time
+	def __init__(self, count: Callable[[], int], rows: int=27) -> None:
+		self.count = count
+		self.rows = rows
+		self.scroll_y = 0
+		self.selected = 0
+
+	@property
+	def position(self) -> int: return self.scroll_y + self.selected
+
+	def step(self, count: int) -> None:
+		total = self.count()
+		if count == 0 or total == 0: return
+		self.scroll_y, self.selected = step_window(self.scroll_y, self.selected, count, total, self.rows)
+
+	def clamp(self) -> None:
+		# keeps the selection on a row after the list shrank or the window was resized
+		total = self.count()
+		self.scroll_y = max(0, min(self.scroll_y, total - self.rows))
+		self.selected = max(0, min(self.selected, self.rows - 1, total - 1 - self.scroll_y))
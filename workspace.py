@@ -0,0 +1,63 @@
+import json
+import os
+import re
+from collections import OrderedDict
+
+from storage import locked, write_atomic
+from task import TaskManager, curr_time
+
+# named task lists, each one a save file of its own in the config folder, tasks.json being the default list
+DEFAULT_LIST = "tasks"
+INDEX_FILE = "lists.json"
+NAME = re.compile(r"[\w-]+")
+
+def list_path(folder: str, name: str) -> str:
+	return os.path.join(folder, f"{name}.json")
+
+def valid_name(name: str) -> bool:
+	# the index file has a name of its own
+	return NAME.fullmatch(name) is not None and f"{name}.json" != INDEX_FILE
+
+class ListIndex:
+	# lists.json, the task counts of every list, read without opening any of them
+	def __init__(self, folder: str) -> None:
+		self.folder = folder
+		self.path = os.path.join(folder, INDEX_FILE)
+
+	def read(self) -> dict[str, dict]:
+		try:
+			with open(self.path) as f: return json.load(f)["lists"]
+		except (FileNotFoundError, ValueError, KeyError):
+			return {}
+
+	def names(self) -> list[str]:
+		# lists written by something that never updated the index show up too, without counts
+		files = {name[:-5] for name in os.listdir(self.folder) if name.endswith(".json") and valid_name(name[:-5])} if os.path.isdir(self.folder) else set()
+		return sorted(files | self.read().keys() | {DEFAULT_LIST})
+
+	def update(self, name: str, tm: TaskManager) -> None:
+		# only counts that cost nothing to read, a lazily loaded list is never decoded for them
+		counts = {"active": tm.active_count, "deleted": tm.deleted_count}
+		entry = self.read().get(name)
+		if entry is not None and all(entry.get(key) == value for key, value in counts.items()): return
+		with locked(self.path):
+			lists = self.read()
+			lists[name] = {**counts, "updated_at": curr_time()}
+			write_atomic(self.path, json.dumps({"lists": lists}, indent=2).encode())
+
+class ListCache:
+	# loaded lists that are not shown, least recently used first, each one whatever the application keeps per list
+	def __init__(self, keep: int=1) -> None:
+		self.keep = keep
+		self.lists: OrderedDict[str, dict] = OrderedDict()
+
+	def stash(self, name: str, state: dict) -> list[dict]:
+		# returns the lists that no longer fit, the caller closes them
+		self.lists[name] = state
+		self.lists.move_to_end(name)
+		evicted = []
+		while len(self.lists) > self.keep: evicted.append(self.lists.popitem(last=False)[1])
+		return evicted
+
+	def take(self, name: str) -> dict | None:
+		return self.lists.pop(name, None)